@@ -1,17 +1,278 @@
 """
 Internal API client for downstream service communication.
 """
+import asyncio
+import contextlib
+import hashlib
 import logging
-from typing import Dict, Any, Optional
-from uuid import uuid4
+import random
+import re
+from typing import Dict, Any, Optional, Set, Tuple, Callable, Awaitable
 import time
+from datetime import datetime
 
 import httpx
+import orjson
 
+from .cache import TTLCache
 from .config import Settings
 
 logger = logging.getLogger(__name__)
 
+# Extracts the numeric Telegram ID from callback params like "user_123|Name"
+_DIGITS_RE = re.compile(r"\d+")
+
+# Emoji pool for the "skipped, here's another match" reply
+_SKIP_EMOJIS = ("👇", "👀", "✨", "🚀", "💡", "🌟", "🔥")
+_rng = random.Random()
+
+# Gender preference keywords, matched on word boundaries in a single pass
+_GENDER_KEYWORDS = {
+    "female": "Female", "woman": "Female", "women": "Female",
+    "girl": "Female", "girls": "Female", "lady": "Female",
+    "male": "Male", "man": "Male", "men": "Male",
+    "boy": "Male", "boys": "Male", "guy": "Male", "guys": "Male",
+    "everyone": "Everyone", "anyone": "Everyone", "anybody": "Everyone",
+    "any preference": "Everyone", "both": "Everyone",
+}
+_GENDER_RE = re.compile(
+    r"\b(" + "|".join(sorted(_GENDER_KEYWORDS, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE
+)
+
+
+# Static user-profile replies, built once at import time
+_START_TEXT = (
+    "Hey, I’m Milo ☕️\n\n"
+    "I’m here to help you find people you’ll actually click with through shared interests, intentions, and real-life events.\n\n"
+    "Think: gym buddy, study buddy, event buddy, hobby friend - whatever fits where you’re at right now.\n\n"
+    "I’ll get to know you a little first so I can suggest the right people, communities, and events for you.\n\n"
+    "Your profile stays private - nothing is shown publicly.\n\n"
+    "Join our announcement channel to keep in touch with the changes we bring to Milo - \n\n"
+    "First, let’s build your profile. Hit /profile command to set up your profile"
+)
+
+_START_RESPONSE = {
+    "type": "text",
+    "content": _START_TEXT,
+    "new_user": True
+}
+
+_HELP_RESPONSE = {
+    "type": "text",
+    "content": "🤖 **Available Commands:**\n\n"
+              "/start - Welcome message\n"
+              "/profile - View your profile details\n"
+              "/connect - Find new matches\n"
+              "/matches - View your matches\n"
+              "/clear - Clear conversation history\n"
+              "/generate <prompt> - AI Generation\n\n"
+              "Just message me naturally to start a conversation!"
+}
+
+_PROFILE_TEXT = (
+    "👤 **Your Profile**\n\n"
+    "Here are your details. Use /connect to find new matches based on your profile!\n\n"
+    "Status: Active\nID: "
+)
+
+_MATCHES_RESPONSE = {
+    "type": "match_list",
+    "content": "❤️ **Your Matches**",
+    "items": [
+        {"name": "Ankit", "reason": "Both interested in ML and AI"},
+        {"name": "Priya", "reason": "Share passion for startups"},
+        {"name": "Rahul", "reason": "Both love hiking"},
+        {"name": "Sara", "reason": "Fellow Python developer"}
+    ]
+}
+
+# Reply to an uploaded document, filled with the file name
+_FILE_RECEIVED_TEXT = (
+    "📄 **Resume Received**: `{}`\n\n"
+    "I'm analyzing your profile... (Mock processed)\n"
+    "Profile updated successfully!"
+)
+
+_UNKNOWN_COMMAND_RESPONSE = {
+    "type": "text",
+    "content": "Unknown command"
+}
+
+# call_user_profile commands whose reply does not depend on the user
+_STATIC_PROFILE_REPLIES = {
+    "/help": _HELP_RESPONSE,
+    "/matches": _MATCHES_RESPONSE,
+}
+
+# System action that tells the gateway to rotate the session ID
+_CLEAR_RESPONSE = {
+    "type": "system_action",
+    "action": "reset_session",
+    "content": "🧹 **Chat History Cleared**.\n\nWe can start fresh now!"
+}
+
+# call_ai_interpret reply texts
+_MATCHES_HINT = "\n\nUse `/matches` command to get your match"
+_INTERPRET_DEFAULT_REPLY = "Got it! Your connection preferences have been updated." + _MATCHES_HINT
+_INTERPRET_FAILED_RESPONSE = {
+    "type": "text",
+    "content": "Failed to interpret message."
+}
+
+# Canned chat/generate reply while the AI service is failing or its circuit is open
+_AI_UNAVAILABLE_RESPONSE = {
+    "type": "text",
+    "content": "I'm a bit overloaded right now, please try again in a moment."
+}
+
+# Marker _make_request returns for an outage when the caller asks to tell it apart
+_SERVICE_UNAVAILABLE = object()
+
+# Cap on how much of a downstream error body is copied into logs
+_MAX_LOGGED_BODY = 1024
+
+# How much of each request body api_requests keeps verbatim
+_PAYLOAD_PREVIEW_BYTES = 256
+
+# Longest Retry-After (seconds) a 429 may ask for before we give up instead
+_RETRY_AFTER_MAX = 5.0
+
+# api_requests telemetry is written in batches: wait this long (seconds) after
+# the first queued record so a burst lands in one insert, capped at this many rows
+_RECORD_FLUSH_INTERVAL = 0.05
+_RECORD_BATCH_SIZE = 500
+
+# Records held while the database is slow; past this they are dropped, not awaited
+_RECORD_QUEUE_SIZE = 10000
+
+# Longest disconnect() waits (seconds) for queued telemetry to be written
+_RECORD_DRAIN_TIMEOUT = 2.0
+
+# Stand-in for endpoints without a bulkhead
+_UNBOUNDED = contextlib.nullcontext()
+
+
+def telegram_client_options(settings: Settings) -> Dict[str, Any]:
+    """Timeout and transport for a Bot API client; the gateway and direct-message clients share them."""
+    return {
+        "timeout": httpx.Timeout(settings.TELEGRAM_TIMEOUT, connect=settings.TELEGRAM_CONNECT_TIMEOUT),
+        # Keep connections warm and multiplexed; the transport only retries failed
+        # connects, never a request that may already have been delivered
+        "transport": httpx.AsyncHTTPTransport(
+            http2=settings.HTTPX_HTTP2,
+            limits=httpx.Limits(
+                max_connections=settings.TELEGRAM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.TELEGRAM_MAX_KEEPALIVE,
+                keepalive_expiry=settings.TELEGRAM_KEEPALIVE_EXPIRY
+            ),
+            retries=1
+        ),
+    }
+
+
+def _service_limits(settings: Settings) -> Dict[str, httpx.Limits]:
+    """Connection pool per downstream service.
+    
+    The conversation service carries every chat/interpret/matching call and gets
+    the configured pool; the others see far less traffic and get a quarter of its
+    connections and a fifth of its keepalive slots.
+    """
+    main = httpx.Limits(
+        max_connections=settings.HTTPX_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTPX_MAX_KEEPALIVE,
+        keepalive_expiry=settings.HTTPX_KEEPALIVE_EXPIRY
+    )
+    aux = httpx.Limits(
+        max_connections=max(1, settings.HTTPX_MAX_CONNECTIONS // 4),
+        max_keepalive_connections=max(1, settings.HTTPX_MAX_KEEPALIVE // 5),
+        keepalive_expiry=settings.HTTPX_KEEPALIVE_EXPIRY
+    )
+    return {
+        "conversation": main,
+        "user_profile": aux,
+        "matching": aux,
+        "notification": aux,
+    }
+
+
+def _summarize_payload(body: bytes) -> Dict[str, Any]:
+    """Size-bounded stand-in for a request body in api_requests: digest, size and a preview."""
+    return {
+        "sha256": hashlib.sha256(body).hexdigest(),
+        "size": len(body),
+        "preview": body[:_PAYLOAD_PREVIEW_BYTES].decode("utf-8", "replace")
+    }
+
+
+def _parse_retry_after(value: Optional[str]) -> float:
+    """Parse a Retry-After header given in seconds; HTTP-dates and junk count as 0."""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _parse_match_uid(match_user: Any) -> Optional[int]:
+    """Telegram ID from a matching-service user id like "user_123" or "123"."""
+    try:
+        return int(str(match_user).replace("user_", ""))
+    except (ValueError, TypeError):
+        return None
+
+
+def _normalize_matches(result: Any) -> Optional[list]:
+    """
+    Extract the matches list from the matching endpoint's response.
+    
+    Accepts a bare list or a {"matches": [...]} wrapper; a status-only
+    dict (e.g. {"status": "processing"}) or a failed call yields None.
+    """
+    if isinstance(result, list):
+        return result
+    if isinstance(result, dict):
+        if "matches" in result:
+            return result["matches"]
+        return None if result.get("status") else result
+    return None
+
+
+def _format_reason(entities: Dict[str, Any]) -> str:
+    """One-line "why this match" summary from a match's extracted entities."""
+    role = entities.get("role")
+    goals = entities.get("goals")
+    interests = entities.get("interests")
+    skills = entities.get("skills")
+    location = entities.get("location")
+    parts = [
+        part for part in (
+            role and f"Role: {role.title()}",
+            goals and f"Goals: {', '.join(goals)}",
+            interests and f"Interests: {', '.join(interests)}",
+            skills and f"Skills: {', '.join(skills)}",
+            location and f"Location: {location}",
+        ) if part
+    ]
+    return " | ".join(parts) if parts else "A great potential connection based on your request!"
+
+
+async def _none() -> None:
+    """Awaitable placeholder for a skipped lookup inside gather()."""
+    return None
+
+
+def _detect_gender_preference(text: str) -> Optional[str]:
+    """
+    Extract a gender preference from free text (e.g. "female hiking partner").
+    
+    Female takes precedence over Male, which takes precedence over Everyone.
+    """
+    found = {_GENDER_KEYWORDS[m.group(1).lower()] for m in _GENDER_RE.finditer(text)}
+    for gender in ("Female", "Male", "Everyone"):
+        if gender in found:
+            return gender
+    return None
+
 
 class InternalAPIClient:
     """Async HTTP client for internal service communication."""
@@ -19,96 +280,341 @@ class InternalAPIClient:
     def __init__(self, settings: Settings, database: Any = None):
         self.settings = settings
         self.database = database
-        self.client: Optional[httpx.AsyncClient] = None
+        # One HTTP client per downstream service, keyed by service name
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        # Bot API client for direct messages sent on behalf of a flow (e.g. match accepted)
+        self.telegram_client: Optional[httpx.AsyncClient] = None
+        self._send_message_path = f"/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
         
-        # Service endpoints
-        self.conversation_url = settings.CONVERSATION_SERVICE_URL
-        self.user_profile_url = settings.USER_PROFILE_SERVICE_URL
-        self.matching_url = settings.MATCHING_SERVICE_URL
-        self.notification_url = settings.NOTIFICATION_SERVICE_URL
-        self.vector_url = f"{settings.CONVERSATION_SERVICE_URL}/conversation/vector"
+        # call_user_profile command table
+        self._profile_commands: Dict[str, Callable[[int, str, str], Awaitable[Optional[Dict[str, Any]]]]] = {
+            "/start": self._profile_start,
+            "/profile": self._profile_show,
+            "/connect": self._profile_connect,
+            "/clear": self._profile_clear,
+        }
+        
+        # api_requests telemetry waiting to be written, and the task writing it
+        self._record_queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(_RECORD_QUEUE_SIZE)
+        self._record_worker: Optional[asyncio.Task] = None
+        
+        # In-flight idempotent requests, keyed by (service, path, body)
+        self._inflight: Dict[Tuple[str, str, bytes], asyncio.Task] = {}
+        
+        # Service base URLs
+        self.service_urls: Dict[str, str] = {
+            "conversation": settings.CONVERSATION_SERVICE_URL,
+            "user_profile": settings.USER_PROFILE_SERVICE_URL,
+            "matching": settings.MATCHING_SERVICE_URL,
+            "notification": settings.NOTIFICATION_SERVICE_URL,
+        }
+        
+        # Concurrency caps (bulkheads) for endpoints sharing the conversation pool, so a
+        # burst of slow /generate or matching calls cannot take every connection from chat
+        self._bulkheads: Dict[str, asyncio.Semaphore] = {
+            "AIService/Chat": asyncio.Semaphore(settings.AI_CHAT_CONCURRENCY),
+            "AIService/Generate": asyncio.Semaphore(settings.AI_GENERATE_CONCURRENCY),
+            "MatchingService/Match": asyncio.Semaphore(settings.MATCH_CONCURRENCY),
+        }
+        
+        # Circuit breaker state per endpoint (keyed by service_name, like the bulkheads),
+        # so failing /generate calls cannot fail fast chat or matching on the same host
+        self._breakers: Dict[str, Dict[str, float]] = {}
         
         # Timeouts
         self.conversation_timeout = settings.CONVERSATION_TIMEOUT
         self.matching_timeout = settings.MATCHING_TIMEOUT
         self.notification_timeout = settings.NOTIFICATION_TIMEOUT
         self.user_profile_timeout = settings.USER_PROFILE_TIMEOUT
+        
+        # Retry and circuit-breaker tunables, read on every downstream call
+        self._max_attempts = max(1, settings.RETRY_MAX_ATTEMPTS)
+        self._retry_base_delay = settings.RETRY_BASE_DELAY
+        self._retry_max_delay = settings.RETRY_MAX_DELAY
+        self._cb_threshold = settings.CB_FAILURE_THRESHOLD
+        self._cb_cooldown = settings.CB_COOLDOWN_SECONDS
+        
+        # Per-phase httpx timeouts, built once per read budget in use
+        self._timeouts: Dict[float, httpx.Timeout] = {}
+        
+        # Replies to deterministic (temperature 0) /generate calls, keyed by prompt and model params
+        self._generate_cache = TTLCache(
+            maxsize=settings.AI_GENERATE_CACHE_SIZE,
+            ttl=settings.AI_GENERATE_CACHE_TTL
+        )
+        
+        # User profiles read for display (names, usernames, photos) while matching
+        self._profile_cache = TTLCache(
+            maxsize=settings.PROFILE_CACHE_SIZE,
+            ttl=settings.PROFILE_CACHE_TTL
+        )
+        
+        # Headers sent on every downstream call; bodies are pre-serialized JSON
+        self._default_headers: Dict[str, str] = {
+            "user-agent": settings.USER_AGENT,
+            "content-type": "application/json",
+            "accept": "application/json"
+        }
+        
+        # Model parameters shared by every AI call; merged into each payload
+        self._ai_params: Dict[str, Any] = {
+            "model_id": settings.AI_MODEL_ID,
+            "max_tokens": settings.AI_MAX_TOKENS,
+            "temperature": settings.AI_TEMPERATURE,
+            "timeout_seconds": settings.AI_TIMEOUT_SECONDS
+        }
     
     async def connect(self):
-        """Initialize HTTP client."""
-        self.client = httpx.AsyncClient(
-            headers={"User-Agent": f"{self.settings.APP_NAME}/{self.settings.APP_VERSION}"}
+        """Initialize one HTTP client per downstream service."""
+        # Long-lived pools keep connections warm so concurrent updates reuse them
+        # instead of paying a new handshake; each service gets its own pool so a
+        # slow backend cannot starve the others
+        limits = _service_limits(self.settings)
+        for service, base_url in self.service_urls.items():
+            self.clients[service] = httpx.AsyncClient(
+                base_url=base_url,
+                headers=self._default_headers,
+                limits=limits[service],
+                # Multiplex concurrent calls over one connection per host (negotiated via ALPN on https)
+                http2=self.settings.HTTPX_HTTP2,
+                # Internal services: skip proxy/.netrc environment lookups
+                trust_env=False
+            )
+        
+        self.telegram_client = httpx.AsyncClient(
+            base_url="https://api.telegram.org",
+            headers=self._default_headers,
+            **telegram_client_options(self.settings)
         )
+        
+        if self.settings.HTTPX_PREWARM:
+            await self._prewarm()
         logger.info("Internal API client initialized")
     
+    async def _prewarm(self):
+        """Open one pooled connection per service so the first user request skips the handshake."""
+        results = await asyncio.gather(
+            *(client.head("/", timeout=2.0) for client in self.clients.values()),
+            return_exceptions=True
+        )
+        for service, result in zip(self.clients, results):
+            if isinstance(result, Exception):
+                logger.warning("Could not pre-warm %s connection: %s", service, result)
+    
     async def disconnect(self):
-        """Close HTTP client."""
-        if self.client:
-            await self.client.aclose()
+        """Flush pending telemetry writes and close HTTP clients."""
+        if self._record_worker is not None:
+            try:
+                await asyncio.wait_for(self._record_queue.join(), _RECORD_DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    "Dropping %d unwritten API request records on shutdown",
+                    self._record_queue.qsize()
+                )
+            self._record_worker.cancel()
+            await asyncio.gather(self._record_worker, return_exceptions=True)
+            self._record_worker = None
+        if self.telegram_client is not None:
+            await self.telegram_client.aclose()
+            self.telegram_client = None
+        if self.clients:
+            for client in self.clients.values():
+                await client.aclose()
+            self.clients.clear()
             logger.info("Internal API client closed")
     
+    def _record_request(self, **fields):
+        """Queue API request telemetry for the background writer, off the response path."""
+        if not self.database:
+            return
+        fields["timestamp"] = datetime.utcnow()
+        try:
+            self._record_queue.put_nowait(fields)
+        except asyncio.QueueFull:
+            # Telemetry is audit-only; never hold a reply back for it
+            logger.warning("API request record queue full, dropping record")
+            return
+        if self._record_worker is None:
+            self._record_worker = asyncio.ensure_future(self._write_records())
+    
+    async def _write_records(self):
+        """Drain queued telemetry into batched api_requests inserts; failures are logged, never raised."""
+        queue = self._record_queue
+        while True:
+            batch = [await queue.get()]
+            await asyncio.sleep(_RECORD_FLUSH_INTERVAL)
+            while len(batch) < _RECORD_BATCH_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await self.database.store_api_requests(batch)
+            except Exception as db_e:
+                logger.error("Failed to store %d API requests: %s", len(batch), db_e)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+    
+    def _breaker(self, service_name: str) -> Dict[str, float]:
+        """Breaker state for an endpoint, created closed on first use."""
+        breaker = self._breakers.get(service_name)
+        if breaker is None:
+            breaker = self._breakers[service_name] = {"fails": 0, "open_until": 0.0}
+        return breaker
+    
+    def _circuit_open(self, service_name: str) -> bool:
+        """
+        Whether calls to the service should fail fast right now.
+        
+        Closed until CB_FAILURE_THRESHOLD consecutive failed calls, then open for
+        CB_COOLDOWN_SECONDS. Once the cooldown passes the circuit is half-open: the
+        first caller goes through as a probe and everyone else keeps failing fast
+        for another cooldown, unless the probe's success closes the circuit first.
+        """
+        breaker = self._breaker(service_name)
+        if breaker["fails"] < self._cb_threshold:
+            return False
+        now = time.monotonic()
+        if breaker["open_until"] > now:
+            return True
+        breaker["open_until"] = now + self._cb_cooldown
+        return False
+    
+    def _record_failure(self, service_name: str):
+        """Count a failed call, opening the circuit once the threshold is reached."""
+        breaker = self._breaker(service_name)
+        breaker["fails"] += 1
+        if breaker["fails"] >= self._cb_threshold:
+            breaker["open_until"] = time.monotonic() + self._cb_cooldown
+            logger.warning(
+                "Circuit opened for %s after %d consecutive failures",
+                service_name,
+                breaker["fails"]
+            )
+    
+    def _record_success(self, service_name: str):
+        """Close the circuit after any response showing the service is healthy."""
+        breaker = self._breaker(service_name)
+        breaker["fails"] = 0
+        breaker["open_until"] = 0.0
+    
     async def _make_request(
         self,
-        url: str,
+        service: str,
+        path: str,
         payload: Dict[str, Any],
-        timeout: int,
+        timeout: float,
         service_name: str,
-        request_id: str
+        request_id: str,
+        coalesce: bool = False,
+        unavailable: Any = None
     ) -> Optional[Dict[str, Any]]:
         """
         Make HTTP request with retry logic.
         
         Args:
-            url: Target URL
+            service: Downstream service key (conversation, user_profile, matching, notification)
+            path: Path relative to the service base URL, or an absolute URL
             payload: Request payload
-            timeout: Request timeout in seconds
+            timeout: Read timeout in seconds
             service_name: Name of the service for logging
             request_id: Unique request ID
+            coalesce: Share one downstream call between identical concurrent
+                requests; only for idempotent endpoints
+            unavailable: Returned instead of None when the service is down or
+                overloaded (timeouts, transport errors, 5xx/429, open circuit), so
+                callers can tell an outage from a request the service rejected
             
         Returns:
-            Response JSON or None on failure
+            Response JSON, `unavailable` on an outage, or None on any other failure
         """
-        if not self.client:
+        # Serialize once; the same bytes are reused on retry. Payloads can carry values
+        # read back from Mongo, so an unserializable one fails the call rather than raising
+        try:
+            body = orjson.dumps(payload)
+        except orjson.JSONEncodeError as e:
+            logger.error(
+                "%s payload is not JSON-serializable: %s",
+                service_name,
+                e,
+                extra={"request_id": request_id, "service": service_name}
+            )
+            return None
+        
+        if coalesce:
+            # Sorted keys so equal payloads built in a different order still match
+            key = (service, path, orjson.dumps(payload, option=orjson.OPT_SORT_KEYS))
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(
+                    self._make_request(
+                        service, path, payload, timeout, service_name, request_id,
+                        unavailable=unavailable
+                    )
+                )
+                self._inflight[key] = task
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            # Shield so one cancelled caller does not cancel the shared call
+            return await asyncio.shield(task)
+        
+        client = self.clients.get(service)
+        if not client:
             logger.error("HTTP client not initialized")
             return None
         
-        for attempt in range(2):  # 0 = first attempt, 1 = retry
-            try:
-                import time
-                start_time = time.time()
-                
-                logger.info(
-                    f"Calling {service_name} (attempt {attempt + 1})",
+        # Only the read budget is service-specific; a dead host or an
+        # exhausted pool should fail in about a second, not after `timeout`
+        request_timeout = self._timeouts.get(timeout)
+        if request_timeout is None:
+            request_timeout = self._timeouts[timeout] = httpx.Timeout(
+                connect=self.settings.CONNECT_TIMEOUT,
+                read=timeout,
+                write=self.settings.WRITE_TIMEOUT,
+                pool=self.settings.POOL_TIMEOUT
+            )
+        
+        last_attempt = self._max_attempts - 1
+        delay = self._retry_base_delay
+        
+        for attempt in range(self._max_attempts):
+            # A service known to be down is not worth a handshake and a timeout
+            if self._circuit_open(service_name):
+                logger.warning(
+                    "%s circuit open, skipping call",
+                    service_name,
                     extra={"request_id": request_id, "service": service_name}
                 )
+                return unavailable
+            
+            retry_after = 0.0
+            # Monotonic, high-resolution clock: wall-clock jumps must not skew latencies
+            start_time = time.perf_counter()
+            try:
+                async with self._bulkheads.get(service_name, _UNBOUNDED):
+                    response = await client.post(path, content=body, timeout=request_timeout)
                 
-                response = await self.client.post(
-                    url,
-                    json=payload,
-                    timeout=timeout
-                )
-                
-                latency_ms = (time.time() - start_time) * 1000
+                latency_ms = (time.perf_counter() - start_time) * 1000
                 
                 response.raise_for_status()
-                result = response.json()
+                result = orjson.loads(response.content)
+                self._record_success(service_name)
                 
-                if getattr(self, "database", None):
-                    try:
-                        await self.database.store_api_request(
-                            service_name=service_name,
-                            endpoint=url,
-                            payload=payload,
-                            latency_ms=latency_ms,
-                            status_code=response.status_code,
-                            request_id=request_id,
-                            response_body=result
-                        )
-                    except Exception as db_e:
-                        logger.error(f"Failed to store API request: {db_e}")
+                self._record_request(
+                    service_name=service_name,
+                    endpoint=str(response.url),
+                    payload=_summarize_payload(body),
+                    latency_ms=latency_ms,
+                    status_code=response.status_code,
+                    request_id=request_id,
+                    response_body=result
+                )
                 
+                # One record per call; the formatters only render the message, so the
+                # outcome details live there rather than in extra
                 logger.info(
-                    f"{service_name} call successful",
+                    "%s call successful (attempt %d, status %d, %.0f ms)",
+                    service_name,
+                    attempt + 1,
+                    response.status_code,
+                    latency_ms,
                     extra={
                         "request_id": request_id,
                         "service": service_name,
@@ -120,49 +626,85 @@ class InternalAPIClient:
                 
             except httpx.TimeoutException as e:
                 logger.warning(
-                    f"{service_name} timeout (attempt {attempt + 1}): {e}",
+                    "%s timeout (attempt %d): %s",
+                    service_name,
+                    attempt + 1,
+                    e,
                     extra={"request_id": request_id, "service": service_name}
                 )
-                if attempt == 1:  # Last retry
-                    return None
+                if attempt == last_attempt:
+                    # One failure per call, once its retries are spent
+                    self._record_failure(service_name)
+                    return unavailable
+            
+            except httpx.TransportError as e:
+                # Connection reset/refused, protocol errors: transient, safe to retry
+                logger.warning(
+                    "%s transport error (attempt %d): %s",
+                    service_name,
+                    attempt + 1,
+                    e,
+                    extra={"request_id": request_id, "service": service_name}
+                )
+                if attempt == last_attempt:
+                    self._record_failure(service_name)
+                    return unavailable
                     
             except httpx.HTTPStatusError as e:
-                latency_ms = (time.time() - start_time) * 1000 if 'start_time' in locals() else 0
-                if getattr(self, "database", None):
-                    try:
-                        await self.database.store_api_request(
-                            service_name=service_name,
-                            endpoint=url,
-                            payload=payload,
-                            latency_ms=latency_ms,
-                            status_code=e.response.status_code,
-                            request_id=request_id
-                        )
-                    except Exception as db_e:
-                        logger.error(f"Failed to store API request: {db_e}")
+                latency_ms = (time.perf_counter() - start_time) * 1000
+                self._record_request(
+                    service_name=service_name,
+                    endpoint=str(e.request.url),
+                    payload=_summarize_payload(body),
+                    latency_ms=latency_ms,
+                    status_code=e.response.status_code,
+                    request_id=request_id
+                )
                 
-                # Log response.text for HTTP errors (status_code >= 400)
-                error_message = f"{service_name} HTTP error: {e.response.status_code}"
-                if e.response.status_code >= 400:
-                    error_message += f" - {e.response.text}"
-                logger.error(
-                    error_message,
+                status_code = e.response.status_code
+                if status_code < 500 and status_code != 429:
+                    # A client error still means the service is up and answering
+                    self._record_success(service_name)
+                # Log the error body once, truncated; the configured formatters only
+                # render the message, so it stays there rather than in extra.
+                # Client errors are the caller's problem, not an outage: warn, don't page
+                logger.log(
+                    logging.ERROR if status_code >= 500 else logging.WARNING,
+                    "%s HTTP error: %d - %s",
+                    service_name,
+                    status_code,
+                    e.response.text[:_MAX_LOGGED_BODY],
                     extra={
                         "request_id": request_id,
                         "service": service_name,
-                        "status_code": e.response.status_code,
-                        "response_text": e.response.text # Also add to extra for structured logging
+                        "status_code": status_code
                     }
                 )
-                if attempt == 1:
+                # 4xx will not change on retry; only server errors and 429 are worth another attempt
+                if status_code < 500 and status_code != 429:
                     return None
+                if attempt == last_attempt:
+                    if status_code >= 500:
+                        self._record_failure(service_name)
+                    return unavailable
+                if status_code == 429:
+                    retry_after = _parse_retry_after(e.response.headers.get("retry-after"))
+                    if retry_after > _RETRY_AFTER_MAX:
+                        # Not worth holding the user's update that long
+                        return unavailable
                     
             except Exception as e:
                 logger.error(
-                    f"{service_name} unexpected error: {e}",
+                    "%s unexpected error: %s",
+                    service_name,
+                    e,
                     extra={"request_id": request_id, "service": service_name}
                 )
                 return None
+            
+            # Space retries out and decorrelate them across concurrent requests
+            delay = min(self._retry_max_delay, _rng.uniform(self._retry_base_delay, delay * 3))
+            await asyncio.sleep(max(delay, retry_after))
         
         return None
     
@@ -187,37 +729,38 @@ class InternalAPIClient:
         Returns:
             AI response payload
         """
-        # Logging/Telemetry for the chat request
-        logger.info(
-            f"Sending chat message to AI model {self.settings.AI_MODEL_ID}",
+        logger.debug(
+            "Sending chat message to AI model %s",
+            self._ai_params["model_id"],
             extra={
                 "request_id": request_id,
                 "chat_id": chat_id,
                 "telegram_user_id": telegram_user_id,
-                "model_id": self.settings.AI_MODEL_ID,
-                "temperature": self.settings.AI_TEMPERATURE
+                "model_id": self._ai_params["model_id"],
+                "temperature": self._ai_params["temperature"]
             }
         )
         
         payload = {
+            **self._ai_params,
             "chat_id": chat_id,
-            "model_id": self.settings.AI_MODEL_ID,
-            "message": message_text,
-            "max_tokens": self.settings.AI_MAX_TOKENS,
-            "temperature": self.settings.AI_TEMPERATURE,
-            "timeout_seconds": self.settings.AI_TIMEOUT_SECONDS
+            "message": message_text
         }
         
-        # Use conversation_url as the AI service base URL
+        # The conversation service is the AI service base URL
         # e.g., http://3.110.172.55:8000/chat
         result = await self._make_request(
-            f"{self.conversation_url}/chat",
+            "conversation",
+            "/chat",
             payload,
             self.conversation_timeout,
             "AIService/Chat",
-            request_id
+            request_id,
+            unavailable=_SERVICE_UNAVAILABLE
         )
         
+        if result is _SERVICE_UNAVAILABLE:
+            return dict(_AI_UNAVAILABLE_RESPONSE)
         if result and "response" in result:
             return {
                 "type": "text",
@@ -241,29 +784,47 @@ class InternalAPIClient:
         Returns:
             AI generation response
         """
-        payload = {
-            "model_id": self.settings.AI_MODEL_ID,
-            "prompt": prompt,
-            "max_tokens": self.settings.AI_MAX_TOKENS,
-            "temperature": self.settings.AI_TEMPERATURE,
-            "timeout_seconds": self.settings.AI_TIMEOUT_SECONDS
-        }
+        # Only temperature 0 output is reproducible, so only then is a cached reply valid
+        cache_key = None
+        if self._ai_params["temperature"] == 0:
+            cache_key = (self._ai_params["model_id"], self._ai_params["max_tokens"], prompt)
+            cached = self._generate_cache.get(cache_key)
+            logger.info(
+                "Generate cache %s",
+                "HIT" if cached else "MISS",
+                extra={"request_id": request_id, "cache": "HIT" if cached else "MISS"}
+            )
+            if cached:
+                return dict(cached)
+        
+        payload = {**self._ai_params, "prompt": prompt}
         
         result = await self._make_request(
-            f"{self.conversation_url}/generate",
+            "conversation",
+            "/generate",
             payload,
             self.conversation_timeout,
             "AIService/Generate",
-            request_id
+            request_id,
+            # Deterministic output: identical concurrent prompts can share one call
+            coalesce=cache_key is not None,
+            unavailable=_SERVICE_UNAVAILABLE
         )
+        
+        if result is _SERVICE_UNAVAILABLE:
+            return dict(_AI_UNAVAILABLE_RESPONSE)
 
         # Standardize return of text content if possible
         if result and ("response" in result or "text" in result or "content" in result):
              content = result.get("response") or result.get("text") or result.get("content")
-             return {
+             response = {
                  "type": "text",
                  "content": content
              }
+             if cache_key and content:
+                 self._generate_cache.set(cache_key, response)
+                 return dict(response)
+             return response
         
         return result
     
@@ -283,11 +844,8 @@ class InternalAPIClient:
         Returns:
             System action response to trigger session rotation
         """
-        return {
-            "type": "system_action",
-            "action": "reset_session",
-            "content": "🧹 **Chat History Cleared**.\n\nWe can start fresh now!"
-        }
+        # Copy: the gateway rewrites "type" once the session has been rotated
+        return dict(_CLEAR_RESPONSE)
 
     async def call_ai_interpret(
         self,
@@ -311,41 +869,36 @@ class InternalAPIClient:
             Interpretation result
         """
         # New requirement: Extract gender preference from message text (e.g. "female hiking partner")
-        lower_text = message_text.lower()
-        extracted_gender = None
-        if any(w in lower_text for w in ["female", "woman", "women", "girl", "girls", "lady"]):
-            extracted_gender = "Female"
-        elif any(w in lower_text for w in ["male", "man", "men", "boy", "boys", "guy", "guys"]):
-            extracted_gender = "Male"
-        elif any(w in lower_text for w in ["everyone", "anyone", "anybody", "any preference", "both"]):
-            extracted_gender = "Everyone"
-            
-        if extracted_gender and self.database:
-            logger.info(f"Detected gender preference '{extracted_gender}' in message: '{message_text}'")
-            await self.database.update_user_preferences(telegram_user_id, {"looking_for_gender": extracted_gender})
+        extracted_gender = _detect_gender_preference(message_text)
 
         payload = {
+            **self._ai_params,
             "chat_id": chat_id,
             "user_id": str(telegram_user_id),
-            "model_id": self.settings.AI_MODEL_ID,
             "message": message_text,
-            "context": {"type": "connection_matching"},
-            "max_tokens": self.settings.AI_MAX_TOKENS,
-            "temperature": self.settings.AI_TEMPERATURE,
-            "timeout_seconds": self.settings.AI_TIMEOUT_SECONDS
+            "context": {"type": "connection_matching"}
         }
         
         # Note: path is /conversation/interpret based on user requirement
-        result = await self._make_request(
-            f"{self.conversation_url}/conversation/interpret",
-            payload,
-            self.conversation_timeout,
-            "AIService/Interpret",
-            request_id
+        # The preference DB work does not depend on the AI reply, so overlap it with the call
+        result, existing_prefs = await asyncio.gather(
+            self._make_request(
+                "conversation",
+                "/conversation/interpret",
+                payload,
+                self.conversation_timeout,
+                "AIService/Interpret",
+                request_id
+            ),
+            self._prepare_interpret_preferences(
+                telegram_user_id, message_text, extracted_gender, merge_preferences
+            )
         )
         
         if result:
-             logger.info(f"AI Interpretation result: {result}")
+             # result can be a large dict; skip building its repr unless it will be emitted
+             if logger.isEnabledFor(logging.INFO):
+                 logger.info("AI Interpretation result: %s", result)
              
              # Store interpreted preferences in the database
              if self.database:
@@ -353,7 +906,7 @@ class InternalAPIClient:
                  if entities is not None:
                      merged_entities = entities
                      if merge_preferences:
-                         existing = await self.database.get_user_preferences(telegram_user_id) or {}
+                         existing = existing_prefs or {}
                          merged_entities = dict(existing)
                          for k, v in entities.items():
                              if isinstance(v, list):
@@ -376,11 +929,12 @@ class InternalAPIClient:
                              else:
                                  merged_entities[k] = v
 
-                     await self.database.update_user_preferences(telegram_user_id, merged_entities)
-                     
                      # Get current user profile for the name and UPSERT to vector DB
-                     user_profile = await self.database.get_user_profile(telegram_user_id)
-                     name = user_profile.get("name", f"User {telegram_user_id}")
+                     _, user_profile = await asyncio.gather(
+                         self.database.update_user_preferences(telegram_user_id, merged_entities),
+                         self._cached_profile(telegram_user_id)
+                     )
+                     name = (user_profile or {}).get("name", f"User {telegram_user_id}")
                      intent = result.get("intent", "find_match")
                      
                      await self.call_vector_upsert(
@@ -397,19 +951,37 @@ class InternalAPIClient:
              # If the interpret endpoint lacks a direct reply (e.g. initial /connect)
              if not reply_text:
                  logger.info("No explicit 'reply' found from interpret endpoint, using default text")
-                 reply_text = "Got it! Your connection preferences have been updated.\n\nUse `/matches` command to get your match"
-             else:
-                 if "/matches" not in reply_text:
-                     reply_text += "\n\nUse `/matches` command to get your match"
+                 reply_text = _INTERPRET_DEFAULT_REPLY
+             elif "/matches" not in reply_text:
+                 reply_text = f"{reply_text}{_MATCHES_HINT}"
              return {
                  "type": "text",
                  "content": reply_text
              }
         
-        return {
-            "type": "text",
-            "content": "Failed to interpret message."
-        }
+        return dict(_INTERPRET_FAILED_RESPONSE)
+
+    async def _prepare_interpret_preferences(
+        self,
+        telegram_user_id: int,
+        message_text: str,
+        extracted_gender: Optional[str],
+        merge_preferences: bool
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Save a detected gender preference, then load preferences for merging.
+        
+        The write happens before the read so the merged result cannot carry a
+        stale looking_for_gender back over the new one.
+        """
+        if not self.database:
+            return None
+        if extracted_gender:
+            logger.info("Detected gender preference '%s' in message: '%s'", extracted_gender, message_text)
+            await self.database.update_user_preferences(telegram_user_id, {"looking_for_gender": extracted_gender})
+        if merge_preferences:
+            return await self.database.get_user_preferences(telegram_user_id)
+        return None
 
     async def call_vector_upsert(
         self,
@@ -433,7 +1005,8 @@ class InternalAPIClient:
             }
         }
         return await self._make_request(
-            self.vector_url,
+            "conversation",
+            "/conversation/vector",
             payload,
             self.conversation_timeout,
             "AIService/VectorUpsert",
@@ -453,82 +1026,51 @@ class InternalAPIClient:
         Returns:
             Mock response with user profile or command result
         """
-        logger.info(f"[MOCK] Calling user profile service for command {command}")
-        
-        if command == "/start":
-            content = (
-                "Hey, I’m Milo ☕️\n\n"
-                "I’m here to help you find people you’ll actually click with through shared interests, intentions, and real-life events.\n\n"
-                "Think: gym buddy, study buddy, event buddy, hobby friend - whatever fits where you’re at right now.\n\n"
-                "I’ll get to know you a little first so I can suggest the right people, communities, and events for you.\n\n"
-                "Your profile stays private - nothing is shown publicly.\n\n"
-                "Join our announcement channel to keep in touch with the changes we bring to Milo - \n\n"
-                "First, let’s build your profile. Hit /profile command to set up your profile"
-            )
-            return {
-                "type": "text",
-                "content": content,
-                "internal_user_id": f"user_{telegram_user_id}",
-                "new_user": True
-            }
-        elif command == "/help":
-            return {
-                "type": "text",
-                "content": "🤖 **Available Commands:**\n\n"
-                          "/start - Welcome message\n"
-                          "/profile - View your profile details\n"
-                          "/connect - Find new matches\n"
-                          "/matches - View your matches\n"
-                          "/clear - Clear conversation history\n"
-                          "/generate <prompt> - AI Generation\n\n"
-                          "Just message me naturally to start a conversation!"
-            }
-        elif command == "/profile":
+        logger.info("[MOCK] Calling user profile service for command %s", command)
+        
+        if command.startswith("FILE:"):
+            # Handle file upload mock
             return {
                 "type": "text",
-                "content": "👤 **Your Profile**\n\n"
-                          "Here are your details. Use /connect to find new matches based on your profile!\n\n"
-                          f"Status: Active\nID: {telegram_user_id}",
-                "internal_user_id": f"user_{telegram_user_id}"
-            }
-        elif command == "/matches":
-            return {
-                "type": "match_list",
-                "content": "❤️ **Your Matches**",
-                "items": [
-                    {"name": "Ankit", "reason": "Both interested in ML and AI"},
-                    {"name": "Priya", "reason": "Share passion for startups"},
-                    {"name": "Rahul", "reason": "Both love hiking"},
-                    {"name": "Sara", "reason": "Fellow Python developer"}
-                ]
-            }
-        elif command == "/connect":
-             return await self.call_ai_interpret(
-                chat_id,
-                telegram_user_id,
-                message_text="I want to connect with someone",
-                request_id=request_id
-            )
-        elif command == "/clear":
-             return await self.call_ai_clear(
-                chat_id,
-                request_id
-            )
-        elif command.startswith("FILE:"):
-             # Handle file upload mock
-             filename = command.split(":", 1)[1]
-             return {
-                "type": "text",
-                "content": f"📄 **Resume Received**: `{filename}`\n\n"
-                           "I'm analyzing your profile... (Mock processed)\n"
-                           "Profile updated successfully!"
+                "content": _FILE_RECEIVED_TEXT.format(command[5:])
             }
+        
+        # Fully static replies need no handler call; copy because callers may rewrite keys
+        static_reply = _STATIC_PROFILE_REPLIES.get(command)
+        if static_reply is not None:
+            return dict(static_reply)
+        
+        handler = self._profile_commands.get(command)
+        if handler:
+            return await handler(telegram_user_id, chat_id, request_id)
+        
+        return {**_UNKNOWN_COMMAND_RESPONSE, "internal_user_id": f"user_{telegram_user_id}"}
+    
+    async def _profile_start(self, telegram_user_id: int, chat_id: str, request_id: str) -> Dict[str, Any]:
+        """Mock /start reply."""
+        return {**_START_RESPONSE, "internal_user_id": f"user_{telegram_user_id}"}
+    
+    async def _profile_show(self, telegram_user_id: int, chat_id: str, request_id: str) -> Dict[str, Any]:
+        """Mock /profile reply."""
         return {
             "type": "text",
-            "content": "Unknown command",
+            "content": f"{_PROFILE_TEXT}{telegram_user_id}",
             "internal_user_id": f"user_{telegram_user_id}"
         }
     
+    async def _profile_connect(self, telegram_user_id: int, chat_id: str, request_id: str) -> Optional[Dict[str, Any]]:
+        """Interpret a generic connect request."""
+        return await self.call_ai_interpret(
+            chat_id,
+            telegram_user_id,
+            message_text="I want to connect with someone",
+            request_id=request_id
+        )
+    
+    async def _profile_clear(self, telegram_user_id: int, chat_id: str, request_id: str) -> Optional[Dict[str, Any]]:
+        """Signal a session reset."""
+        return await self.call_ai_clear(chat_id, request_id)
+    
     async def call_matching(
         self,
         chat_id: str,
@@ -540,7 +1082,7 @@ class InternalAPIClient:
         """
         Call matching service endpoint.
         """
-        logger.info(f"Calling matching service for action {action} and user {telegram_user_id}")
+        logger.info("Calling matching service for action %s and user %s", action, telegram_user_id)
         
         # Default fallback candidate
         candidate = {
@@ -550,123 +1092,77 @@ class InternalAPIClient:
         }
         
         no_matches_found = False
+        candidates = []
         
         try:
             payload = {
                 "user_id": str(telegram_user_id),
-                "model_id": self.settings.AI_MODEL_ID,
+                "model_id": self._ai_params["model_id"],
                 "top_k": 20
             }
             
-            # Fetch all connections (accepted, pending, or rejected) to exclude from matches
-            if self.database:
-                all_conns_cursor = self.database.db.connections.find({
-                    "$or": [
-                        {"from_user_id": telegram_user_id},
-                        {"to_user_id": telegram_user_id}
-                    ]
-                })
-                excluded_ids = set()
-                async for conn in all_conns_cursor:
-                    if conn.get("from_user_id") == telegram_user_id:
-                        excluded_ids.add(str(conn.get("to_user_id")))
-                    else:
-                        excluded_ids.add(str(conn.get("from_user_id")))
-            else:
-                excluded_ids = set()
-            
-            result = await self._make_request(
-                f"{self.conversation_url}/conversation/matching",
-                payload,
-                self.conversation_timeout,
-                "MatchingService/Match",
-                request_id
+            # The matching call and the user's own DB state are independent; fetch them together
+            result, excluded_ids, current_preferences, user_profile = await asyncio.gather(
+                self._make_request(
+                    "conversation",
+                    "/conversation/matching",
+                    payload,
+                    self.conversation_timeout,
+                    "MatchingService/Match",
+                    request_id,
+                    # Read-only lookup; repeated /matches taps share one in-flight call
+                    coalesce=True
+                ),
+                self._connected_user_ids(telegram_user_id),
+                self.database.get_user_preferences(telegram_user_id) if self.database else _none(),
+                self._cached_profile(telegram_user_id)
             )
+            pref_gender = current_preferences.get("looking_for_gender") if current_preferences else None
             
-            candidates = []
-            
-            # Extract matches list flexibly
-            matches = None
-            if isinstance(result, list):
-                matches = result
-            elif isinstance(result, dict):
-                matches = result.get("matches") if "matches" in result else (result if not result.get("status") else None)
+            matches = _normalize_matches(result)
             
             if matches is not None:
                 if not matches:
                     no_matches_found = True
                 else:
+                    # Drop already-connected users up front, then load every remaining profile at once
+                    default_user = f"User_{target_user_id}" if target_user_id else "Unknown User"
+                    pending = []
                     for match_data in matches:
-                        match_user = match_data.get("user_id", f"User_{target_user_id}" if target_user_id else "Unknown User")
+                        match_user = match_data.get("user_id", default_user)
+                        if str(match_user) not in excluded_ids:
+                            pending.append((match_data, match_user, _parse_match_uid(match_user)))
+                    
+                    profiles = await asyncio.gather(*(
+                        self._cached_profile(uid) if uid else _none()
+                        for _, _, uid in pending
+                    ))
+                    
+                    for (match_data, match_user, uid), db_profile in zip(pending, profiles):
                         data = match_data.get("data", {})
                         
                         # Some versions of the endpoint return entities directly in data, while others nest it
-                        entities = data.get("entities") or data
-                        
-                        interests = entities.get("interests", [])
-                        skills = entities.get("skills", [])
-                        goals = entities.get("goals", [])
-                        location = entities.get("location", "")
-                        role = entities.get("role", "")
-                        
-                        reason_parts = []
-                        if role:
-                            reason_parts.append(f"Role: {role.title()}")
-                        if goals:
-                            reason_parts.append(f"Goals: {', '.join(goals)}")
-                        if interests:
-                            reason_parts.append(f"Interests: {', '.join(interests)}")
-                        if skills:
-                            reason_parts.append(f"Skills: {', '.join(skills)}")
-                        if location:
-                            reason_parts.append(f"Location: {location}")
-                            
-                        reason_str = " | ".join(reason_parts) if reason_parts else "A great potential connection based on your request!"
+                        reason_str = _format_reason(data.get("entities") or data)
                         score = match_data.get("score", 0.0)
-                        # Fetch real name from DB if it's unknown or just a user_id
+                        # Use the real name from DB if it's unknown or just a user_id
                         display_name = match_data.get("name") or match_user
-                        if self.database and (not display_name or display_name == match_user or display_name == "Unknown"):
-                            try:
-                                # try to parse match_user as int if possible
-                                uid = int(str(match_user).replace("user_", ""))
-                                db_profile = await self.database.get_user_profile(uid)
-                                if db_profile and db_profile.get("name"):
-                                    display_name = db_profile.get("name")
-                            except (ValueError, TypeError):
-                                pass
-
-                        # Skip if already connected
-                        if str(match_user) in excluded_ids:
-                             continue
-
-                        # Fetch real profile details from DB
-                        uid = None
-                        try:
-                            uid = int(str(match_user).replace("user_", ""))
-                        except (ValueError, TypeError):
-                            pass
                             
                         photo_id = None
                         age = None
                         gender = None
                         
-                        if self.database and uid:
-                            db_profile = await self.database.get_user_profile(uid)
-                            if db_profile:
-                                if not display_name or display_name == match_user or display_name == "Unknown":
-                                    display_name = db_profile.get("name") or display_name
-                                photo_id = db_profile.get("photo_id")
-                                age = db_profile.get("age")
-                                gender = db_profile.get("gender")
+                        if db_profile:
+                            if not display_name or display_name == match_user or display_name == "Unknown":
+                                display_name = db_profile.get("name") or display_name
+                            photo_id = db_profile.get("photo_id")
+                            age = db_profile.get("age")
+                            gender = db_profile.get("gender")
                         
                         # Apply gender filter in gateway if preference exists
                         # (Only if we have the gender data for the match)
-                        current_preferences = await self.database.get_user_preferences(telegram_user_id) if self.database else {}
-                        pref_gender = current_preferences.get("looking_for_gender") if current_preferences else None
-                        
                         if pref_gender and pref_gender != "Everyone" and gender:
                             if gender != pref_gender:
-                                logger.info(f"Filtering out match {match_user} due to gender preference ({pref_gender})")
+                                logger.info("Filtering out match %s due to gender preference (%s)", match_user, pref_gender)
                                 continue
 
                         candidates.append({
@@ -682,7 +1178,6 @@ class InternalAPIClient:
                     
                     if candidates:
                         # Prioritize same-gender matches for Female users
-                        user_profile = await self.database.get_user_profile(telegram_user_id) if self.database else {}
                         user_gender = user_profile.get("gender") if user_profile else None
                         
                         if user_gender == "Female":
@@ -694,7 +1189,7 @@ class InternalAPIClient:
                             candidates = female_matches[:5] + other_matches
                             # Limit to a reasonable number total (e.g. 10) or keep all 20
                             candidates = candidates[:10]
-                            logger.info(f"Prioritized females first for female user {telegram_user_id}")
+                            logger.info("Prioritized females first for female user %s", telegram_user_id)
 
                         candidate = candidates[0]  # Update fallback just in case
                         
@@ -705,7 +1200,7 @@ class InternalAPIClient:
                 pass # Not removing the old entirely just in case, but keeping it simple
                     
         except Exception as e:
-            logger.error(f"Error calling matching API: {e}")
+            logger.error("Error calling matching API: %s", e)
         
         if no_matches_found:
             return {
@@ -722,14 +1217,16 @@ class InternalAPIClient:
                 
             # Try to find exactly where we currently are
             current_idx = -1
-            current_target_clean = current_target.replace("user_", "")
+            # Lowercase the target once rather than on every comparison
+            current_target_lower = current_target.lower()
+            current_target_clean = current_target.replace("user_", "").lower()
             
             for i, item in enumerate(items):
                 # match the display name format or matching user_id
                 item_id_clean = str(item.get("user_id", "")).replace("user_", "")
                 item_name_clean = item.get("name", "")
                 
-                if item_id_clean.lower() == current_target_clean.lower() or item_name_clean.lower() == current_target.lower():
+                if item_id_clean.lower() == current_target_clean or item_name_clean.lower() == current_target_lower:
                     current_idx = i
                     break
                     
@@ -746,17 +1243,13 @@ class InternalAPIClient:
                 "items": [next_candidate]  # Only show the 1st
             }
         elif action == "SKIP":
-            import random
-            emojis = ["👇", "👀", "✨", "🚀", "💡", "🌟", "🔥"]
-            emoji = random.choice(emojis)
+            emoji = _rng.choice(_SKIP_EMOJIS)
             return {
                 "type": "match_list",
                 "content": f"Skipped {target_user_id}. How about this match? {emoji}",
                 "items": [next_candidate]
             }
         elif action == "ACCEPT":
-            import re
-            
             # Extract target user_id and optionally target_name if separated by |
             parts = target_user_id.split("|", 1) if target_user_id else []
             if not parts:
@@ -765,21 +1258,22 @@ class InternalAPIClient:
             raw_target_id = parts[0]
             provided_target_name = parts[1] if len(parts) > 1 else raw_target_id
             
-            m = re.search(r'\d+', raw_target_id)
+            m = _DIGITS_RE.search(raw_target_id)
             if m:
                 target_tg_id = int(m.group())
 
-                current_profile = await self.database.get_user_profile(telegram_user_id) if self.database else {}
+                logger.info("🔗 [MATCH ACCEPTED] User %s generated a native direct message portal to connect with %s.", telegram_user_id, target_tg_id)
+
+                # Both profiles (for the links), the preferences and the connection write are independent
+                current_profile, target_profile, current_preferences, _ = await asyncio.gather(
+                    self._cached_profile(telegram_user_id),
+                    self._cached_profile(target_tg_id),
+                    self.database.get_user_preferences(telegram_user_id) if self.database else _none(),
+                    self.database.record_connection(telegram_user_id, target_tg_id, "accepted") if self.database else _none()
+                )
+                current_profile = current_profile or {}
                 current_name = current_profile.get("name", "A connection")
                 current_username = current_profile.get("username")
-
-                logger.info(f"🔗 [MATCH ACCEPTED] User {telegram_user_id} generated a native direct message portal to connect with {target_tg_id}.")
-
-                if self.database:
-                    await self.database.record_connection(telegram_user_id, target_tg_id, "accepted")
-
-                # Fetch target's name so we can nicely link to it
-                target_profile = await self.database.get_user_profile(target_tg_id) if self.database else {}
                 target_name = target_profile.get("name", provided_target_name) if target_profile else provided_target_name
                 target_username = target_profile.get("username") if target_profile else None
 
@@ -787,7 +1281,6 @@ class InternalAPIClient:
                 my_url = f"https://t.me/{current_username}" if current_username else f"tg://user?id={telegram_user_id}"
                 their_url = f"https://t.me/{target_username}" if target_username else f"tg://user?id={target_tg_id}"
 
-                current_preferences = await self.database.get_user_preferences(telegram_user_id) if self.database else {}
                 preferences_text = ""
                 if current_preferences:
                     pref_parts = []
@@ -810,18 +1303,19 @@ class InternalAPIClient:
                 else:
                     target_message += f'\n👉 <a href="{my_url}">Message {current_name}</a>\n_(If unclickable, they must set a Telegram Username)_'
 
-                await self.send_direct_message(
-                    target_tg_id,
-                    target_message,
-                    parse_mode="HTML",
-                    reply_markup=target_markup
-                )
-
-                # Send a backend push/system notification that a new match connection occurred
-                await self.call_notification(
-                    str(target_tg_id),
-                    "new_match",
-                    request_id
+                # The target's DM and the backend push notification go out together
+                await asyncio.gather(
+                    self.send_direct_message(
+                        target_tg_id,
+                        target_message,
+                        parse_mode="HTML",
+                        reply_markup=target_markup
+                    ),
+                    self.call_notification(
+                        str(target_tg_id),
+                        "new_match",
+                        request_id
+                    )
                 )
 
                 current_message = f"✅ Connected with {target_name}!\n\n💬 <b>Private Chat Ready</b>\nYou can now start a direct Telegram chat with them here:"
@@ -856,6 +1350,41 @@ class InternalAPIClient:
             "success": True
         }
     
+    async def _cached_profile(self, telegram_user_id: int) -> Optional[Dict[str, Any]]:
+        """
+        User profile for display purposes, cached for PROFILE_CACHE_TTL seconds.
+        
+        Only for reads that tolerate a briefly stale profile; onboarding reads its
+        own writes and must go to the database. Missing profiles are not cached so
+        a user who just finished onboarding shows up at once.
+        """
+        if not self.database:
+            return None
+        profile = self._profile_cache.get(telegram_user_id)
+        if profile is None:
+            profile = await self.database.get_user_profile(telegram_user_id)
+            if profile:
+                self._profile_cache.set(telegram_user_id, profile)
+        return profile
+    
+    async def _connected_user_ids(self, telegram_user_id: int) -> Set[str]:
+        """IDs of everyone the user has a connection with (accepted, pending, or rejected)."""
+        excluded_ids = set()
+        if not self.database:
+            return excluded_ids
+        all_conns_cursor = self.database.db.connections.find({
+            "$or": [
+                {"from_user_id": telegram_user_id},
+                {"to_user_id": telegram_user_id}
+            ]
+        })
+        async for conn in all_conns_cursor:
+            if conn.get("from_user_id") == telegram_user_id:
+                excluded_ids.add(str(conn.get("to_user_id")))
+            else:
+                excluded_ids.add(str(conn.get("from_user_id")))
+        return excluded_ids
+    
     async def call_notification(
         self,
         internal_user_id: str,
@@ -870,8 +1399,11 @@ class InternalAPIClient:
             "notification_type": notification_type,
             "request_id": request_id
         }
+        # The service is called at its configured URL itself: an absolute URL bypasses
+        # base_url, which would otherwise add a trailing slash (and a redirect) to it
         return await self._make_request(
-            self.notification_url,
+            "notification",
+            self.service_urls["notification"],
             payload,
             self.notification_timeout,
             "NotificationService/Notify",
@@ -880,17 +1412,21 @@ class InternalAPIClient:
 
     async def send_direct_message(self, target_telegram_id: int, text: str, parse_mode: str = "Markdown", reply_markup: Optional[Dict[str, Any]] = None) -> bool:
         """Helper to send out-of-bounds explicit direct messages to Telegram users."""
-        import httpx
+        if not self.telegram_client:
+            logger.error("Telegram client not initialized")
+            return False
         try:
-            url = f"https://api.telegram.org/bot{self.settings.TELEGRAM_BOT_TOKEN}/sendMessage"
             payload = {"chat_id": target_telegram_id, "text": text, "parse_mode": parse_mode}
             if reply_markup:
                 payload["reply_markup"] = reply_markup
-                
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(url, json=payload, timeout=5.0)
-                resp.raise_for_status()
-                return True
+            
+            # Pooled client: repeated DMs reuse the open connection to api.telegram.org
+            resp = await self.telegram_client.post(
+                self._send_message_path,
+                content=orjson.dumps(payload)
+            )
+            resp.raise_for_status()
+            return True
         except Exception as e:
-            logger.error(f"Failed to send direct message to {target_telegram_id}: {e}")
+            logger.error("Failed to send direct message to %s: %s", target_telegram_id, e)
             return False
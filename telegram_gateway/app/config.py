@@ -2,7 +2,7 @@
 Configuration management for Telegram Gateway Service.
 """
 from typing import Optional
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
 
 
@@ -31,6 +31,12 @@ class Settings(BaseSettings):
     AI_MAX_TOKENS: int = 1024
     AI_TEMPERATURE: float = 0.7
     AI_TIMEOUT_SECONDS: int = 30
+    AI_GENERATE_CACHE_SIZE: int = 1024
+    AI_GENERATE_CACHE_TTL: int = 3600  # seconds; only used when AI_TEMPERATURE is 0
+    
+    # Profile Cache Configuration (display-only reads in matching/interpret)
+    PROFILE_CACHE_SIZE: int = 10000
+    PROFILE_CACHE_TTL: float = 30.0  # seconds
     
     # Re-engagement Configuration
     RE_ENGAGE_HOURS: float = 36.0
@@ -54,6 +60,37 @@ class Settings(BaseSettings):
     MATCHING_TIMEOUT: int = 15
     NOTIFICATION_TIMEOUT: int = 15
     USER_PROFILE_TIMEOUT: int = 15
+    CONNECT_TIMEOUT: float = 1.0  # applies to every downstream call; the above are read timeouts
+    WRITE_TIMEOUT: float = 2.0
+    POOL_TIMEOUT: float = 1.0
+    
+    # HTTP Client Configuration
+    HTTPX_HTTP2: bool = True
+    HTTPX_MAX_CONNECTIONS: int = 200  # conversation service; other services get a quarter
+    HTTPX_MAX_KEEPALIVE: int = 100
+    HTTPX_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    
+    # Telegram Bot API clients (webhook replies and direct messages)
+    TELEGRAM_TIMEOUT: float = 5.0  # seconds per call
+    TELEGRAM_CONNECT_TIMEOUT: float = 2.0
+    TELEGRAM_MAX_CONNECTIONS: int = 128
+    TELEGRAM_MAX_KEEPALIVE: int = 64
+    TELEGRAM_KEEPALIVE_EXPIRY: float = 60.0  # seconds
+    
+    # Bulkheads: max concurrent calls per endpoint on the shared conversation pool
+    AI_CHAT_CONCURRENCY: int = 150
+    AI_GENERATE_CONCURRENCY: int = 20
+    MATCH_CONCURRENCY: int = 30
+    HTTPX_PREWARM: bool = True
+    
+    # Retry Configuration
+    RETRY_MAX_ATTEMPTS: int = 3
+    RETRY_BASE_DELAY: float = 0.05  # seconds; decorrelated-jitter backoff bounds
+    RETRY_MAX_DELAY: float = 1.0
+    
+    # Circuit Breaker Configuration
+    CB_FAILURE_THRESHOLD: int = 5  # consecutive failed calls (after retries) per endpoint
+    CB_COOLDOWN_SECONDS: float = 30.0
     
     # Logging Configuration
     LOG_LEVEL: str = "INFO"
@@ -64,9 +101,18 @@ class Settings(BaseSettings):
     APP_VERSION: str = "1.0.0"
     ENVIRONMENT: str = "development"
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
+    @property
+    def USER_AGENT(self) -> str:
+        """User-Agent sent on every outbound HTTP request."""
+        return f"{self.APP_NAME}/{self.APP_VERSION}"
+    
+    # Frozen: read-only after startup, so components may snapshot values safely
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        case_sensitive=True,
+        frozen=True,
+        extra="ignore"
+    )
 
 
 @lru_cache()
@@ -1,13 +1,27 @@
 """
 Persistent database for user mappings using MongoDB (Motor).
 """
+import asyncio
 import logging
-from typing import Optional, List
+from typing import Optional, List, Set, Tuple
 from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne, ReturnDocument
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure
 
 logger = logging.getLogger(__name__)
 
+# Message-id tracking is written in batches rather than one upsert per message
+_MESSAGE_FLUSH_INTERVAL = 0.2
+_MESSAGE_BATCH_SIZE = 200
+_DUPLICATE_KEY = 11000
+_NAMESPACE_EXISTS = 48
+_MESSAGES_INDEX = [("telegram_user_id", 1), ("message_id", 1)]
+
+# api_requests is append-only telemetry: bucketed per service, kept for 30 days
+_API_REQUESTS_TIMESERIES = {"timeField": "timestamp", "metaField": "service_name", "granularity": "seconds"}
+_API_REQUESTS_RETENTION = 30 * 86400
+
 class Database:
     """Manages persistent user data with MongoDB."""
     
@@ -16,6 +30,11 @@ class Database:
         self.db_name = db_name
         self.client: Optional[AsyncIOMotorClient] = None
         self.db = None
+        self._msg_buf: List[InsertOne] = []
+        self._msg_event = asyncio.Event()
+        self._msg_lock = asyncio.Lock()
+        self._msg_flush_task: Optional[asyncio.Task] = None
+        self._pending_writes: Set[asyncio.Task] = set()
 
     async def connect(self):
         """Establish database connection and ensure indexes."""
@@ -31,43 +50,78 @@ class Database:
             
             # Ensure unique message tracking (sparse to tolerate missing fields)
             await self.db.messages.create_index(
-                [("telegram_user_id", 1), ("message_id", 1)], 
+                _MESSAGES_INDEX,
                 unique=True,
                 sparse=True
             )
             
+            await self._ensure_api_requests_collection()
+            
             # Verify connection
             await self.client.admin.command('ping')
+            self._msg_flush_task = asyncio.create_task(self._flush_messages_loop())
             logger.info("MongoDB connection established and indexes verified")
         except Exception as e:
             logger.error(f"Database connection error: {e}")
             raise
 
+    async def _ensure_api_requests_collection(self):
+        """Create api_requests as a time-series collection unless it already exists."""
+        try:
+            await self.db.create_collection(
+                "api_requests",
+                timeseries=_API_REQUESTS_TIMESERIES,
+                expireAfterSeconds=_API_REQUESTS_RETENTION
+            )
+            logger.info("Created time-series collection api_requests")
+        except CollectionInvalid:
+            # Existing deployments keep their collection as-is
+            pass
+        except OperationFailure as e:
+            # Another worker may have created it first; servers older than 5.0 have no
+            # time-series support, and a plain collection still works there
+            if e.code != _NAMESPACE_EXISTS:
+                logger.warning(f"Could not create time-series api_requests collection: {e}")
+
     async def disconnect(self):
         """Close database connection."""
+        if self._msg_flush_task:
+            self._msg_flush_task.cancel()
+            try:
+                await self._msg_flush_task
+            except asyncio.CancelledError:
+                pass
+            self._msg_flush_task = None
+        await self._flush_messages()
+        await self._wait_pending_writes()
         if self.client:
             self.client.close()
             logger.info("Database connection closed")
 
-    async def get_chat_id(self, telegram_user_id: int) -> Optional[str]:
-        """Retrieve persistent chat_id."""
+    async def get_user(
+        self,
+        telegram_user_id: int,
+        fields: Tuple[str, ...] = ("chat_id", "state", "is_profile_complete")
+    ) -> Optional[dict]:
+        """Retrieve several top-level user fields in one round trip."""
         if self.db is None: return None
         try:
-            doc = await self.db.users.find_one({"telegram_user_id": telegram_user_id})
-            return doc.get("chat_id") if doc else None
+            projection = {field: 1 for field in fields}
+            projection["_id"] = 0
+            return await self.db.users.find_one({"telegram_user_id": telegram_user_id}, projection)
         except Exception as e:
-            logger.error(f"Error retrieving chat_id: {e}")
+            logger.error(f"Error retrieving user fields {fields}: {e}")
             return None
 
+    async def get_chat_id(self, telegram_user_id: int) -> Optional[str]:
+        """Retrieve persistent chat_id."""
+        doc = await self.get_user(telegram_user_id, ("chat_id",))
+        return doc.get("chat_id") if doc else None
+
     async def get_user_state(self, telegram_user_id: int) -> Optional[str]:
         """Retrieve user state."""
-        if self.db is None: return None
-        try:
-            doc = await self.db.users.find_one({"telegram_user_id": telegram_user_id})
-            return doc.get("state") if doc else None
-        except Exception as e:
-            logger.error(f"Error retrieving state: {e}")
-            return None
+        doc = await self.get_user(telegram_user_id, ("state",))
+        return doc.get("state") if doc else None
 
     async def update_user_state(self, telegram_user_id: int, state: Optional[str]) -> bool:
         """Update user state."""
@@ -87,7 +141,10 @@ class Database:
         """Retrieve user connection preferences."""
         if self.db is None: return None
         try:
-            doc = await self.db.users.find_one({"telegram_user_id": telegram_user_id})
+            doc = await self.db.users.find_one(
+                {"telegram_user_id": telegram_user_id},
+                {"preferences": 1, "_id": 0}
+            )
             return doc.get("preferences") if doc else None
         except Exception as e:
             logger.error(f"Error retrieving preferences: {e}")
@@ -115,7 +172,10 @@ class Database:
         """Retrieve user profile data."""
         if self.db is None: return None
         try:
-            doc = await self.db.users.find_one({"telegram_user_id": telegram_user_id})
+            doc = await self.db.users.find_one(
+                {"telegram_user_id": telegram_user_id},
+                {"profile": 1, "_id": 0}
+            )
             return doc.get("profile") if doc else None
         except Exception as e:
             logger.error(f"Error retrieving profile: {e}")
@@ -153,7 +213,10 @@ class Database:
         """Check if a user has completed onboarding."""
         if self.db is None: return False
         try:
-            doc = await self.db.users.find_one({"telegram_user_id": telegram_user_id})
+            doc = await self.db.users.find_one(
+                {"telegram_user_id": telegram_user_id},
+                {"is_profile_complete": 1, "_id": 0}
+            )
             return doc.get("is_profile_complete", False) if doc else False
         except Exception:
             return False
@@ -186,30 +249,71 @@ class Database:
             logger.error(f"Error storing user mapping: {e}")
             return False
 
-    async def add_message(self, telegram_user_id: int, message_id: int) -> bool:
-        """Log a message ID for a user."""
+    async def add_message(self, telegram_user_id: int, message_id: int, buffered: bool = True) -> bool:
+        """
+        Track a message ID for a user.
+        
+        Buffered IDs are written with the next batch, within _MESSAGE_FLUSH_INTERVAL.
+        The buffer is per worker, so a /clear handled by another worker in that window
+        misses them; the bot's own replies are therefore written inline (buffered=False).
+        """
         if self.db is None:
             return False
-        try:
-            await self.db.messages.update_one(
-                {"telegram_user_id": telegram_user_id, "message_id": message_id},
-                {"$set": {"telegram_user_id": telegram_user_id, "message_id": message_id}},
-                upsert=True
-            )
-            return True
-        except Exception:
-            return False
+        if not buffered:
+            try:
+                await self.db.messages.update_one(
+                    {"telegram_user_id": telegram_user_id, "message_id": message_id},
+                    {"$set": {"telegram_user_id": telegram_user_id, "message_id": message_id}},
+                    upsert=True
+                )
+                return True
+            except Exception as e:
+                logger.error(f"Error storing message ID: {e}")
+                return False
+        self._msg_buf.append(InsertOne({"telegram_user_id": telegram_user_id, "message_id": message_id}))
+        if len(self._msg_buf) >= _MESSAGE_BATCH_SIZE:
+            self._msg_event.set()
+        return True
+
+    async def _flush_messages_loop(self):
+        """Flush buffered message IDs every interval, or sooner once a batch is full."""
+        while True:
+            try:
+                await asyncio.wait_for(self._msg_event.wait(), _MESSAGE_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._msg_event.clear()
+            await self._flush_messages()
+
+    async def _flush_messages(self):
+        """Write out buffered message IDs; duplicates of already tracked IDs are ignored."""
+        # The lock makes readers wait for a batch that is already in flight
+        async with self._msg_lock:
+            if not self._msg_buf or self.db is None:
+                return
+            batch, self._msg_buf = self._msg_buf, []
+            try:
+                await self.db.messages.bulk_write(batch, ordered=False)
+            except BulkWriteError as e:
+                errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != _DUPLICATE_KEY]
+                if errors or e.details.get("writeConcernErrors"):
+                    logger.error(f"Error storing message IDs: {errors or e.details['writeConcernErrors']}")
+            except Exception as e:
+                logger.error(f"Error storing {len(batch)} message IDs: {e}")
 
     async def get_messages(self, telegram_user_id: int) -> List[int]:
-        """Get all message IDs for a user."""
+        """Get all message IDs for a user (including IDs buffered by this worker)."""
         if self.db is None:
             return []
+        await self._flush_messages()
         try:
-            cursor = self.db.messages.find({"telegram_user_id": telegram_user_id})
-            messages = []
-            async for doc in cursor:
-                messages.append(doc["message_id"])
-            return messages
+            # Only indexed fields are projected, so the compound index covers the query
+            cursor = self.db.messages.find(
+                {"telegram_user_id": telegram_user_id},
+                {"message_id": 1, "_id": 0}
+            ).hint(_MESSAGES_INDEX).batch_size(1000)
+            docs = await cursor.to_list(length=None)
+            return [doc["message_id"] for doc in docs]
         except Exception:
             return []
 
@@ -217,6 +321,9 @@ class Database:
         """Clear message history for a user from DB."""
         if self.db is None:
             return False
+        # Flush first so this worker's buffered IDs cannot land after the delete; other
+        # workers' buffers are not visible here (see add_message)
+        await self._flush_messages()
         try:
             await self.db.messages.delete_many({"telegram_user_id": telegram_user_id})
             return True
@@ -227,6 +334,9 @@ class Database:
         """Clear AI conversation history for a user from DB."""
         if self.db is None:
             return False
+        # Let this worker's in-flight log writes land first so they cannot survive the
+        # clear; writes still pending on another worker are not waited for
+        await self._wait_pending_writes()
         try:
             await self.db.conversations.delete_many({"telegram_user_id": telegram_user_id})
             return True
@@ -265,6 +375,25 @@ class Database:
             logger.error(f"Error storing API request: {e}")
             return False
 
+    async def store_api_requests(self, records: List[dict]) -> bool:
+        """Store a batch of API request metrics in one insert."""
+        if self.db is None or not records:
+            return False
+        try:
+            docs = []
+            for record in records:
+                doc = dict(record)
+                response_body = doc.pop("response_body", None)
+                if response_body:
+                    doc["response"] = response_body
+                doc.setdefault("timestamp", datetime.utcnow())
+                docs.append(doc)
+            await self.db.api_requests.insert_many(docs, ordered=False)
+            return True
+        except Exception as e:
+            logger.error(f"Error storing API requests: {e}")
+            return False
+
     async def log_conversation(
         self,
         telegram_user_id: int,
@@ -288,6 +417,23 @@ class Database:
             logger.error(f"Error logging conversation: {e}")
             return False
 
+    def log_conversation_nowait(
+        self,
+        telegram_user_id: int,
+        role: str,
+        content: str,
+        request_id: Optional[str] = None
+    ):
+        """Schedule log_conversation without holding the caller up for the insert."""
+        task = asyncio.create_task(self.log_conversation(telegram_user_id, role, content, request_id))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+
+    async def _wait_pending_writes(self):
+        """Wait for scheduled log writes to finish."""
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+
     async def store_match_result(
         self,
         telegram_user_id: int,
@@ -417,7 +563,8 @@ class Database:
                         {"from_user_id": user_a, "to_user_id": user_b},
                         {"from_user_id": user_b, "to_user_id": user_a},
                     ]
-                }
+                },
+                {"status": 1, "_id": 0}
             )
             return doc.get("status") if doc else None
         except Exception as e:
@@ -429,7 +576,10 @@ class Database:
         if self.db is None:
             return None
         try:
-            doc = await self.db.users.find_one({"telegram_user_id": telegram_user_id})
+            doc = await self.db.users.find_one(
+                {"telegram_user_id": telegram_user_id},
+                {"profile": 1, "preferences": 1, "_id": 0}
+            )
             if not doc:
                 return None
             profile = doc.get("profile", {})
@@ -474,7 +624,6 @@ class Database:
         if self.db is None:
             return 0
         try:
-            from pymongo import ReturnDocument
             result = await self.db.users.find_one_and_update(
                 {"telegram_user_id": telegram_user_id},
                 {"$inc": {"message_count": 1}},
@@ -486,14 +635,17 @@ class Database:
             logger.error(f"Error incrementing message count: {e}")
             return 0
 
-    async def update_last_active(self, telegram_user_id: int) -> bool:
-        """Update the last activity timestamp for a user."""
+    async def upsert_user(self, telegram_user_id: int, *, username: Optional[str] = None) -> bool:
+        """Touch last activity and apply per-update user fields in a single upsert."""
         if self.db is None:
             return False
+        fields = {"last_active_at": datetime.utcnow()}
+        if username:
+            fields["profile.username"] = username
         try:
             await self.db.users.update_one(
                 {"telegram_user_id": telegram_user_id},
-                {"$set": {"last_active_at": datetime.utcnow()}},
+                {"$set": fields},
                 upsert=True
             )
             return True
@@ -501,6 +653,10 @@ class Database:
             logger.error(f"Error updating last activity: {e}")
             return False
 
+    async def update_last_active(self, telegram_user_id: int) -> bool:
+        """Update the last activity timestamp for a user."""
+        return await self.upsert_user(telegram_user_id)
+
     async def get_inactive_users(self, hours: float) -> List[dict]:
         """Fetch users who haven't been active for more than specified hours."""
         if self.db is None:
@@ -6,6 +6,26 @@ from typing import Dict, Any, List, Optional
 
 logger = logging.getLogger(__name__)
 
+# Telegram rejects inline buttons whose callback_data exceeds this many bytes
+CALLBACK_DATA_MAX_BYTES = 64
+
+
+def clip_callback_data(data: str) -> str:
+    """Trim callback_data to Telegram's byte limit without splitting a UTF-8 character."""
+    if len(data) <= CALLBACK_DATA_MAX_BYTES // 4:
+        # Four bytes per character at most, so short strings always fit
+        return data
+    return data.encode("utf-8")[:CALLBACK_DATA_MAX_BYTES].decode("utf-8", "ignore")
+
+
+# Read-only keyboard shared by every confirmation prompt
+_CONFIRMATION_BUTTONS = [
+    [
+        {"text": "✅ Confirm", "callback_data": "CONFIRM"},
+        {"text": "❌ Cancel", "callback_data": "CANCEL"}
+    ]
+]
+
 
 class TelegramResponseFormatter:
     """Formats internal service responses into Telegram API payloads."""
@@ -210,16 +230,11 @@ class TelegramResponseFormatter:
                     age_str = f" ({age})" if age else ""
                     gender_str = f" | {gender}" if gender else ""
                     
-                    match_card_text = f"👤 **{name}{age_str}**{gender_str}\n"
-                    if match_percent:
-                        match_card_text += f"⭐ {rating}/5.0 • {match_percent}% Match\n"
-                    else:
-                        match_card_text += f"⭐ {rating}/5.0\n"
-                    
-                    match_card_text += f"\n{reason}"
+                    rating_str = f"⭐ {rating}/5.0 • {match_percent}% Match" if match_percent else f"⭐ {rating}/5.0"
+                    match_card_text = f"👤 **{name}{age_str}**{gender_str}\n{rating_str}\n\n{reason}"
                     
                     # Store name in the callback payload to avoid needing a DB lookup on request
-                    request_payload = f"REQUEST:{user_id}|{name}"[:64]
+                    request_payload = clip_callback_data(f"REQUEST:{user_id}|{name}")
                     buttons = [[
                         {"text": "✅ Connect", "callback_data": request_payload},
                         {"text": "⏭ Skip", "callback_data": f"SKIP:{user_id}"}
@@ -236,12 +251,7 @@ class TelegramResponseFormatter:
                 return payloads # Return the list of payloads
             
             elif response_type == "confirmation":
-                buttons = [
-                    [
-                        {"text": "✅ Confirm", "callback_data": "CONFIRM"},
-                        {"text": "❌ Cancel", "callback_data": "CANCEL"}
-                    ]
-                ]
+                buttons = _CONFIRMATION_BUTTONS
                 
                 if message_id:
                     return self.format_edit_message(chat_id, message_id, content, buttons, parse_mode=parse_mode)
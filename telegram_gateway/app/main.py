@@ -2,22 +2,26 @@
 Telegram Bot Gateway Service - Main Application
 """
 import logging
+import random
+import re
 import sys
+import time
 from contextlib import asynccontextmanager
 from typing import Dict, Any, Tuple, Optional
 from uuid import uuid4
 
 from fastapi import FastAPI, Request, Response, Header, HTTPException, Depends, Body
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel
 import httpx
+import orjson
 
 from .config import get_settings, Settings
 from .session_manager import SessionManager
 from .database import Database
 from .rate_limiter import RateLimiter
-from .api_client import InternalAPIClient
+from .api_client import InternalAPIClient, telegram_client_options
 from .router import TelegramRouter
 from .formatter import TelegramResponseFormatter
 from .admin_api.router import router as admin_router, broadcast_router
@@ -82,7 +86,10 @@ async def lifespan(app: FastAPI):
     
     # Initialize Telegram HTTP client
     telegram_http_client = httpx.AsyncClient(
-        base_url=f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}"
+        base_url=f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}",
+        # Every Bot API call posts a pre-serialized JSON body
+        headers={"user-agent": settings.USER_AGENT, "content-type": "application/json"},
+        **telegram_client_options(settings)
     )
     
     # Set up Telegram bot menu commands
@@ -96,13 +103,13 @@ async def lifespan(app: FastAPI):
                 {"command": "clear", "description": "Clear your conversation history"}
             ]
         }
-        response = await telegram_http_client.post("/setMyCommands", json=commands_payload, timeout=5.0)
+        response = await telegram_http_client.post("/setMyCommands", content=orjson.dumps(commands_payload))
         if response.status_code == 200:
             logger.info("Successfully updated Telegram bot menu commands")
         else:
-            logger.warning(f"Failed to update Telegram bot menu: {response.text}")
+            logger.warning("Failed to update Telegram bot menu: %s", response.text)
     except Exception as e:
-        logger.error(f"Error setting Telegram commands: {e}")
+        logger.error("Error setting Telegram commands: %s", e)
     
     logger.info("All services initialized successfully")
     
@@ -114,17 +121,17 @@ async def lifespan(app: FastAPI):
             res_ids = await send_telegram_message(payload, req_id, tg_uid, database)
             if res_ids and database:
                 if isinstance(res_ids, list):
-                    for rid in res_ids: await database.add_message(tg_uid, rid)
-                else: await database.add_message(tg_uid, res_ids)
+                    for rid in res_ids: await database.add_message(tg_uid, rid, buffered=False)
+                else: await database.add_message(tg_uid, res_ids, buffered=False)
             return res_ids
         except httpx.HTTPStatusError as e:
             if e.response.status_code in [400, 403]:
                 # 403: Forbidden (blocked), 400: Bad Request (sometimes means blocked)
-                logger.warning(f"User {payload.get('chat_id')} might have blocked the bot: {e.response.status_code}")
+                logger.warning("User %s might have blocked the bot: %s", payload.get('chat_id'), e.response.status_code)
                 return "BLOCKED"
             return None
         except Exception as e:
-            logger.error(f"Re-engage send error: {e}")
+            logger.error("Re-engage send error: %s", e)
             return None
 
     asyncio.create_task(
@@ -135,9 +142,10 @@ async def lifespan(app: FastAPI):
     
     # Cleanup
     logger.info("Shutting down services")
+    # The API client drains queued telemetry into the database, so it goes first
+    await api_client.disconnect()
     await session_manager.disconnect()
     await rate_limiter.disconnect()
-    await api_client.disconnect()
     await telegram_http_client.aclose()
     logger.info("Shutdown complete")
 
@@ -146,7 +154,8 @@ async def lifespan(app: FastAPI):
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS configuration
@@ -160,13 +169,16 @@ origins = [
     "https://admin.lythe.com",
 ]
 
+# Common bot/hacker paths to block immediately, matched in a single pass
+_SCANNER_PATH_RE = re.compile(
+    "|".join(map(re.escape, [".php", ".aspx", ".jsp", ".env", "wp-content", "wp-admin", "config.js"]))
+)
+
 # Scanner rejection middleware (early return to keep logs clean)
 @app.middleware("http")
 async def block_scanners(request: Request, call_next):
     """Middleware to block common bot scanners and silence their logs."""
-    path = request.url.path
-    # Common bot/hacker paths to block immediately
-    if any(ext in path for ext in [".php", ".aspx", ".jsp", ".env", "wp-content", "wp-admin", "config.js"]):
+    if _SCANNER_PATH_RE.search(request.url.path):
         return Response(status_code=404)
     return await call_next(request)
 
@@ -184,9 +196,28 @@ app.include_router(admin_router)
 app.include_router(broadcast_router)
 
 
-def get_request_id() -> str:
+def request_id_v7() -> str:
+    """
+    Generate a time-ordered UUIDv7 string for request tracing.
+
+    Request IDs only need to be unique, not unpredictable, so the 74 random
+    bits come from the process PRNG instead of a getrandom() call per request.
+    """
+    value = (
+        (time.time_ns() // 1_000_000) << 80
+        | 0x7 << 76
+        | random.getrandbits(12) << 64
+        | 0b10 << 62
+        | random.getrandbits(62)
+    )
+    h = f"{value:032x}"
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+async def get_request_id() -> str:
     """Generate unique request ID."""
-    return str(uuid4())
+    # async so FastAPI resolves it inline rather than via the threadpool
+    return request_id_v7()
 
 
 @app.get("/health")
@@ -279,9 +310,9 @@ async def telegram_webhook(
         
         # Parse update payload
         try:
-            update = await request.json()
+            update = orjson.loads(await request.body())
         except Exception as e:
-            logger.error(f"Failed to parse update JSON: {e}", extra={"request_id": request_id})
+            logger.error("Failed to parse update JSON: %s", e, extra={"request_id": request_id})
             return Response(status_code=200)
         
         # Extract telegram_user_id and chat_id and optionally username
@@ -291,19 +322,16 @@ async def telegram_webhook(
             logger.error("Could not extract user info from update", extra={"request_id": request_id})
             return Response(status_code=200)
             
-        # Update last activity for every user update
-        await database.update_last_active(telegram_user_id)
+        # Update last activity for every user update, and opportunistically save the
+        # username if they have one so we can link them properly later (one upsert)
+        await database.upsert_user(telegram_user_id, username=username)
             
         # Store user message ID for history tracking
         if message_id:
             await database.add_message(telegram_user_id, message_id)
-            
-        # Opportunistically save the username if they have one so we can link them properly later
-        if username:
-            await database.update_user_profile_field(telegram_user_id, "username", username)
         
         if text:
-            await database.log_conversation(telegram_user_id, "user", text, request_id)
+            database.log_conversation_nowait(telegram_user_id, "user", text, request_id)
 
         logger.info(
             f"Processing update for telegram_user_id={telegram_user_id}",
@@ -327,7 +355,7 @@ async def telegram_webhook(
                 database
             )
             if sent_msg_id:
-                await database.add_message(telegram_user_id, sent_msg_id)
+                await database.add_message(telegram_user_id, sent_msg_id, buffered=False)
             return Response(status_code=200)
         
         # Get or create session
@@ -387,13 +415,11 @@ async def telegram_webhook(
                             try:
                                 await telegram_http_client.post(
                                     "/deleteMessage",
-                                    json={"chat_id": chat_id, "message_id": msg_id},
-                                    timeout=5.0
+                                    content=orjson.dumps({"chat_id": chat_id, "message_id": msg_id})
                                 )
                             except Exception as del_e:
                                 # Start logging these errors to debug
-                                logger.warning(f"Failed to delete message {msg_id}: {del_e}")
-                                pass
+                                logger.warning("Failed to delete message %s: %s", msg_id, del_e)
                         
                         # Clear from DB
                         await database.clear_messages(telegram_user_id)
@@ -401,7 +427,7 @@ async def telegram_webhook(
                         logger.info("Message history and conversation logs cleared from DB", extra={"request_id": request_id})
                         
                     except Exception as db_e:
-                         logger.error(f"Error handling history deletion: {db_e}", extra={"request_id": request_id})
+                         logger.error("Error handling history deletion: %s", db_e, extra={"request_id": request_id})
 
                     # 2. Rotate session ID to "clear" AI context
                     new_chat_id = str(uuid4())
@@ -417,7 +443,7 @@ async def telegram_webhook(
                     response["type"] = "text"
                 
                 except Exception as reset_e:
-                    logger.error(f"CRITICAL ERROR in reset_session: {reset_e}", exc_info=True, extra={"request_id": request_id})
+                    logger.error("CRITICAL ERROR in reset_session: %s", reset_e, exc_info=True, extra={"request_id": request_id})
                     # Fallback so user still gets a response
                     response["type"] = "text"
                     response["content"] = "Chat history cleared (with some internal errors)."
@@ -431,7 +457,7 @@ async def telegram_webhook(
                 database
             )
             if sent_msg_id:
-                await database.add_message(telegram_user_id, sent_msg_id)
+                await database.add_message(telegram_user_id, sent_msg_id, buffered=False)
             return Response(status_code=200)
         
         # Determine if we should edit or send new
@@ -441,7 +467,7 @@ async def telegram_webhook(
 
         # Log bot response if it has text content
         if response and response.get("content") and response.get("type", "text") == "text":
-            await database.log_conversation(telegram_user_id, "bot", response["content"], request_id)
+            database.log_conversation_nowait(telegram_user_id, "bot", response["content"], request_id)
 
         # Format response for Telegram
         telegram_payload = formatter.format_response(
@@ -457,12 +483,12 @@ async def telegram_webhook(
                 try:
                     await telegram_http_client.post(
                         "/answerCallbackQuery",
-                        json={"callback_query_id": callback_query_id},
-                        timeout=5.0
+                        content=orjson.dumps({"callback_query_id": callback_query_id})
                     )
                 except Exception as cb_e:
                     logger.warning(
-                        f"Failed to answer callback query: {cb_e}",
+                        "Failed to answer callback query: %s",
+                        cb_e,
                         extra={"request_id": request_id}
                     )
         
@@ -472,9 +498,9 @@ async def telegram_webhook(
         if sent_ids:
             if isinstance(sent_ids, list):
                 for sid in sent_ids:
-                    await database.add_message(telegram_user_id, sid)
+                    await database.add_message(telegram_user_id, sid, buffered=False)
             else:
-                await database.add_message(telegram_user_id, sent_ids)
+                await database.add_message(telegram_user_id, sent_ids, buffered=False)
         
         logger.info(
             "Update processed successfully",
@@ -486,7 +512,8 @@ async def telegram_webhook(
         
     except Exception as e:
         logger.error(
-            f"Unexpected error in webhook handler: {e}",
+            "Unexpected error in webhook handler: %s",
+            e,
             exc_info=True,
             extra={"request_id": request_id}
         )
@@ -504,13 +531,21 @@ async def telegram_webhook(
                     # We can't easily await database here if we are inside broad exception handler
                     # but we can try
                     pass
-        except:
-            pass
+        except Exception as notify_e:
+            logger.warning(
+                "Failed to send error message to user: %s",
+                notify_e,
+                extra={"request_id": request_id}
+            )
     
     # ALWAYS return 200
     return Response(status_code=200)
 
 
+# Shared read-only stand-in for missing update fields
+_EMPTY: Dict[str, Any] = {}
+
+
 def extract_user_info(update: Dict[str, Any]) -> Tuple[Optional[int], Optional[int], Optional[int], Optional[str], Optional[str]]:
     """
     Extract telegram_user_id, chat_id, message_id, username, and text from update.
@@ -519,26 +554,30 @@ def extract_user_info(update: Dict[str, Any]) -> Tuple[Optional[int], Optional[i
         Tuple of (telegram_user_id, chat_id, message_id, username, text)
     """
     try:
-        if "message" in update:
-            message = update["message"]
+        message = update.get("message")
+        if message is not None:
+            sender = message.get("from") or _EMPTY
             return (
-                message.get("from", {}).get("id"),
-                message.get("chat", {}).get("id"),
+                sender.get("id"),
+                (message.get("chat") or _EMPTY).get("id"),
                 message.get("message_id"),
-                message.get("from", {}).get("username"),
+                sender.get("username"),
                 message.get("text")
             )
-        elif "callback_query" in update:
-            callback = update["callback_query"]
+        callback = update.get("callback_query")
+        if callback is not None:
+            sender = callback.get("from") or _EMPTY
+            callback_message = callback.get("message") or _EMPTY
             return (
-                callback.get("from", {}).get("id"),
-                callback.get("message", {}).get("chat", {}).get("id"),
-                callback.get("message", {}).get("message_id"),
-                callback.get("from", {}).get("username"),
+                sender.get("id"),
+                (callback_message.get("chat") or _EMPTY).get("id"),
+                callback_message.get("message_id"),
+                sender.get("username"),
                 callback.get("data") # For callbacks, we use data as text
             )
     except Exception as e:
-        logger.error(f"Error extracting user info: {e}")
+        # Only reachable for malformed bodies (e.g. a non-object "message")
+        logger.error("Error extracting user info: %s", e)
     
     return None, None, None, None, None
 
@@ -579,17 +618,16 @@ async def send_telegram_message(payload: Any, request_id: str, telegram_user_id:
         try:
             response = await telegram_http_client.post(
                 endpoint,
-                json=payload,
-                timeout=5.0
+                content=orjson.dumps(payload)
             )
             
             response.raise_for_status()
-            result = response.json()
+            result = orjson.loads(response.content)
             
             # Log bot response to our database if available
             if database and telegram_user_id:
                 bot_text = payload.get("text") or payload.get("caption") or "[Photo/Media Message]"
-                await database.log_conversation(telegram_user_id, "bot", bot_text, request_id)
+                database.log_conversation_nowait(telegram_user_id, "bot", bot_text, request_id)
 
             logger.info(
                 f"Telegram message sent successfully via {endpoint}",
@@ -601,7 +639,9 @@ async def send_telegram_message(payload: Any, request_id: str, telegram_user_id:
             
         except httpx.HTTPStatusError as e:
             logger.error(
-                f"Telegram API error (attempt {attempt + 1}): {e.response.status_code}",
+                "Telegram API error (attempt %d): %s",
+                attempt + 1,
+                e.response.status_code,
                 extra={"request_id": request_id, "response": e.response.text}
             )
             
@@ -618,7 +658,9 @@ async def send_telegram_message(payload: Any, request_id: str, telegram_user_id:
                 
         except Exception as e:
             logger.error(
-                f"Failed to send Telegram message (attempt {attempt + 1}): {e}",
+                "Failed to send Telegram message (attempt %d): %s",
+                attempt + 1,
+                e,
                 extra={"request_id": request_id}
             )
             if attempt == 1: raise
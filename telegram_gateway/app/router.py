@@ -1,17 +1,51 @@
 """
 Table-driven routing for Telegram updates.
 """
+import base64
 import logging
-from typing import Dict, Any, Optional, Callable, Awaitable, TYPE_CHECKING
+import re
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple, TYPE_CHECKING
 from enum import Enum
 
 from .api_client import InternalAPIClient
+from .formatter import clip_callback_data
 
 if TYPE_CHECKING:
     from .session_manager import SessionManager
 
 logger = logging.getLogger(__name__)
 
+# Commands available before onboarding is complete
+_PRE_ONBOARDING_COMMANDS = frozenset({"/start", "/profile", "/help"})
+
+# Reply-keyboard labels that open the profile flow
+_PROFILE_BUTTONS = frozenset({"Set Profile", "My Profile"})
+
+# Leading "/command" or "/command@botname" plus following whitespace
+_COMMAND_PREFIX_RE = re.compile(r"^/\w+(?:@\w+)?\s*")
+
+# Static reply texts, built once at import time
+_WELCOME_TEXT = (
+    "Hey, I’m Milo ☕️\n\n"
+    "I’m here to help you find people you’ll actually click with through shared interests, intentions, and real-life events.\n\n"
+    "Think: gym buddy, study buddy, event buddy, hobby friend - whatever fits where you’re at right now.\n\n"
+    "I’ll get to know you a little first so I can suggest the right people, communities, and events for you.\n\n"
+    "Your profile stays private - nothing is shown publicly.\n\n"
+    "Join our announcement channel to keep in touch with the changes we bring to Milo - \n\n"
+    "First, let’s build your profile. Hit /profile command to set up your profile"
+)
+
+_PROFILE_SETUP_TEXT = (
+    "Let’s build your Milo profile 👋\n"
+    "I’ll keep this quick. Your answers will stay private and help me suggest better people, communities, and events.\n\n"
+    "First - what should I call you?"
+)
+
+
+def _strip_command(text: str) -> str:
+    """Return the argument text following a leading bot command."""
+    return _COMMAND_PREFIX_RE.sub("", text, count=1).strip()
+
 
 class RouteType(str, Enum):
     """Route types for different update handlers."""
@@ -59,6 +93,14 @@ class TelegramRouter:
             "REQUEST": self._handle_request_callback,
             "CANCEL_REQUEST": self._handle_cancel_request_callback,
         }
+
+        # Reply-keyboard routing table: label -> (handler, command text it stands for)
+        self.TEXT_ROUTES: Dict[str, Tuple[Callable, str]] = {
+            **{label: (self._handle_profile_button, "/profile") for label in _PROFILE_BUTTONS},
+            "Set Goal": (self._handle_connect_command, "/connect"),
+            "Find Matches": (self._handle_matches_command, "/matches"),
+            "My Connections": (self._handle_connections_command, "/connections"),
+        }
     
     async def route_update(
         self,
@@ -107,11 +149,11 @@ class TelegramRouter:
                 )
             
             else:
-                logger.warning(f"Unknown update type: {update.keys()}")
+                logger.warning("Unknown update type: %s", list(update))
                 return None
                 
         except Exception as e:
-            logger.error(f"Error routing update: {e}", exc_info=True)
+            logger.error("Error routing update: %s", e, exc_info=True)
             return None
     
     async def _route_message(
@@ -128,9 +170,11 @@ class TelegramRouter:
         if text.startswith("/"):
             command = text.split()[0].lower()
             
-            # Allow /start, /profile, /help even if not onboarded
-            is_onboarded = await self.api_client.database.get_onboarding_status(telegram_user_id)
-            if not is_onboarded and command not in ["/start", "/profile", "/help"]:
+            # Allow /start, /profile, /help even if not onboarded (no DB lookup needed)
+            if (
+                command not in _PRE_ONBOARDING_COMMANDS
+                and not await self.api_client.database.get_onboarding_status(telegram_user_id)
+            ):
                 return {
                     "type": "text", 
                     "content": "Please complete your profile first using `/profile` to access this command.",
@@ -141,7 +185,8 @@ class TelegramRouter:
             
             if handler:
                 logger.info(
-                    f"Routing to command handler: {command}",
+                    "Routing to command handler: %s",
+                    command,
                     extra={"request_id": request_id, "command": command}
                 )
                 return await handler(
@@ -151,33 +196,23 @@ class TelegramRouter:
                     request_id
                 )
             else:
-                logger.warning(f"Unknown command: {command}")
+                logger.warning("Unknown command: %s", command)
                 return {
                     "type": "text",
                     "content": f"Unknown command: {command}\n\nUse /help to see available commands."
                 }
         
+        # Reply-keyboard buttons map straight to their command handlers
+        text_route = self.TEXT_ROUTES.get(text)
+        if text_route:
+            handler, command_text = text_route
+            return await handler(chat_id, telegram_user_id, command_text, request_id)
+
         # Regular text message -> Check State or Conversation Service
         logger.info(
             "Routing to conversation service",
             extra={"request_id": request_id, "route": "conversation"}
         )
-        
-        # New Matchmaking Logic Integration
-        if text in ["Set Profile", "My Profile"]:
-            # If user already exists, show profile, else start setup
-            user_profile = await self.api_client.database.get_user_profile(telegram_user_id)
-            if user_profile and user_profile.get("name"):
-                return await self._handle_profile_command(chat_id, telegram_user_id, "/profile", request_id)
-            else:
-                 return await self._handle_profile_command(chat_id, telegram_user_id, "/profile setup", request_id)
-        elif text == "Set Goal":
-            return await self._handle_connect_command(chat_id, telegram_user_id, "/connect", request_id)
-        elif text == "Find Matches":
-            return await self._handle_matches_command(chat_id, telegram_user_id, "/matches", request_id)
-        elif text == "My Connections":
-            return await self._handle_connections_command(chat_id, telegram_user_id, "/connections", request_id)
-            
         return await self._handle_text_message(
             chat_id,
             telegram_user_id,
@@ -185,6 +220,20 @@ class TelegramRouter:
             request_id
         )
 
+    async def _handle_profile_button(
+        self,
+        chat_id: str,
+        telegram_user_id: int,
+        text: str,
+        request_id: str
+    ) -> Optional[Dict[str, Any]]:
+        """Handle the profile reply-keyboard buttons."""
+        # If user already exists, show profile, else start setup
+        user_profile = await self.api_client.database.get_user_profile(telegram_user_id)
+        if user_profile and user_profile.get("name"):
+            return await self._handle_profile_command(chat_id, telegram_user_id, "/profile", request_id)
+        return await self._handle_profile_command(chat_id, telegram_user_id, "/profile setup", request_id)
+
     # ... (other methods) ...
 
     async def _handle_text_message(
@@ -195,13 +244,13 @@ class TelegramRouter:
         request_id: str
     ) -> Optional[Dict[str, Any]]:
         """Handle regular text messages."""
-        # Check strict state
-        state = await self.session_manager.get_persistent_state(telegram_user_id)
-        is_onboarded = await self.api_client.database.get_onboarding_status(telegram_user_id)
+        # Check strict state; state and onboarding status live on the same user document
+        user = await self.api_client.database.get_user(telegram_user_id, ("state", "is_profile_complete")) or {}
+        state = user.get("state")
         
         # If not onboarded, only allow if they are in a setup state
         is_in_setup = state and str(state).startswith("AWAITING_PROFILE_")
-        if not is_onboarded and not is_in_setup:
+        if not is_in_setup and not user.get("is_profile_complete", False):
              return {
                 "type": "text",
                 "content": "Please complete your profile first to start chatting with Milo! 🚀\n\nHit /profile to set it up.",
@@ -212,25 +261,24 @@ class TelegramRouter:
             target_tg_id = int(str(state).split(":")[1])
             
             # Identify current user's name
-            current_profile = await self.api_client.database.get_user_profile(telegram_user_id) if getattr(self.api_client, "database", None) else {}
+            current_profile = await self.api_client.database.get_user_profile(telegram_user_id) if self.api_client.database else {}
             current_name = current_profile.get("name", "Connection")
             
             # Proxy message to the other person dynamically
-            logger.info(f"🔒 [CHAT ROOM PROXY] Sending message from {telegram_user_id} ({current_name}) -> To user {target_tg_id}")
+            logger.info("🔒 [CHAT ROOM PROXY] Sending message from %s (%s) -> To user %s", telegram_user_id, current_name, target_tg_id)
             success = await self.api_client.send_direct_message(
                 target_tg_id, 
                 f"💬 **{current_name}:**\n{text}"
             )
             
             if not success:
-               logger.warning(f"🔒 [CHAT ROOM ERROR] Failed to deliver from {telegram_user_id} to {target_tg_id}")
+               logger.warning("🔒 [CHAT ROOM ERROR] Failed to deliver from %s to %s", telegram_user_id, target_tg_id)
                return {"type": "text", "content": "Failed to send message to the chat room. The other user may have blocked the bot."}
                
             return None # We handled the message successfully as a transparent proxy.
             
         if state == "AWAITING_CONNECT_PERSON":
             # State transition to second question, save first answer in state string
-            import base64
             # Using base64 to safely store arbitrary text in the state string
             encoded_text = base64.b64encode(text.encode('utf-8')).decode('utf-8')
             await self.session_manager.set_persistent_state(telegram_user_id, f"AWAITING_CONNECT_EXPLORE:{encoded_text}")
@@ -242,7 +290,6 @@ class TelegramRouter:
         if state and str(state).startswith("AWAITING_CONNECT_EXPLORE:"):
             # State completed, clear it
             encoded_text = str(state).split(":", 1)[1]
-            import base64
             try:
                 first_answer = base64.b64decode(encoded_text.encode('utf-8')).decode('utf-8')
             except Exception:
@@ -274,7 +321,7 @@ class TelegramRouter:
             )
             
         if state == "AWAITING_PROFILE_NAME":
-            if getattr(self.api_client, "database", None):
+            if self.api_client.database:
                 await self.api_client.database.update_user_profile_field(telegram_user_id, "name", text)
             await self.session_manager.set_persistent_state(telegram_user_id, "AWAITING_PROFILE_AGE")
             return {"type": "text", "content": "Nice to meet you! **(Step 2/6)**\n\nHow old are you?"}
@@ -288,7 +335,7 @@ class TelegramRouter:
             except ValueError:
                 return {"type": "text", "content": "Please enter a valid number for your age."}
                 
-            if getattr(self.api_client, "database", None):
+            if self.api_client.database:
                 await self.api_client.database.update_user_profile_field(telegram_user_id, "age", str(age_val))
             await self.session_manager.set_persistent_state(telegram_user_id, "AWAITING_PROFILE_GENDER")
             return {
@@ -301,7 +348,7 @@ class TelegramRouter:
             }
 
         if state == "AWAITING_PROFILE_GENDER":
-            if getattr(self.api_client, "database", None):
+            if self.api_client.database:
                 await self.api_client.database.update_user_profile_field(telegram_user_id, "gender", text)
             await self.session_manager.set_persistent_state(telegram_user_id, "AWAITING_PROFILE_INTERESTS")
             return {
@@ -310,7 +357,7 @@ class TelegramRouter:
             }
 
         if state == "AWAITING_PROFILE_INTERESTS":
-            if getattr(self.api_client, "database", None):
+            if self.api_client.database:
                 await self.api_client.database.update_user_profile_field(telegram_user_id, "interests", text)
             await self.session_manager.set_persistent_state(telegram_user_id, "AWAITING_PROFILE_INTENT")
             return {
@@ -324,7 +371,7 @@ class TelegramRouter:
             }
 
         if state == "AWAITING_PROFILE_INTENT":
-            if getattr(self.api_client, "database", None):
+            if self.api_client.database:
                 await self.api_client.database.update_user_preferences(telegram_user_id, {"connection_intent": text})
             await self.session_manager.set_persistent_state(telegram_user_id, "AWAITING_PROFILE_LOCATION")
             return {
@@ -337,7 +384,7 @@ class TelegramRouter:
             }
 
         if state == "AWAITING_PROFILE_LOCATION":
-            if getattr(self.api_client, "database", None):
+            if self.api_client.database:
                 await self.api_client.database.update_user_profile_field(telegram_user_id, "location", text)
                 await self.api_client.database.set_onboarding_status(telegram_user_id, True)
                 
@@ -363,7 +410,7 @@ class TelegramRouter:
             )
             
             # 2. Explicitly save as connection_intent so /matches recognizes it
-            if getattr(self.api_client, "database", None):
+            if self.api_client.database:
                 await self.api_client.database.update_user_preferences(telegram_user_id, {"connection_intent": text})
             
             # 2. Confirm update and IMMEDIATELY show matches
@@ -379,7 +426,7 @@ class TelegramRouter:
             # Legacy cleanup just in case any user is stuck in it
             await self.session_manager.set_persistent_state(telegram_user_id, None)
             
-        db = getattr(self.api_client, "database", None)
+        db = self.api_client.database
         if db:
             count = await db.increment_message_count(telegram_user_id)
             if count % 3 == 0:
@@ -390,7 +437,7 @@ class TelegramRouter:
                             merge_preferences=True
                         )
                     except Exception as e:
-                        logger.error(f"Background personality extraction failed: {e}")
+                        logger.error("Background personality extraction failed: %s", e)
                 asyncio.create_task(_bg_extract())
 
         return await self.api_client.call_ai_chat(
@@ -418,7 +465,7 @@ class TelegramRouter:
             }
 
         # Extract everything after the /connect command
-        query = text.lower().replace("/connect", "").strip()
+        query = _strip_command(text).lower()
         
         if query:
             # 1. Interpret to save preferences
@@ -430,7 +477,7 @@ class TelegramRouter:
             )
             
             # 2. Explicitly save as connection_intent
-            if getattr(self.api_client, "database", None):
+            if self.api_client.database:
                 await self.api_client.database.update_user_preferences(telegram_user_id, {"connection_intent": query})
             
             # 3. IMMEDIATELY show matches for this query
@@ -467,7 +514,7 @@ class TelegramRouter:
             }
             
         # Extract everything after the /new command
-        query = text.lower().replace("/new", "").strip()
+        query = _strip_command(text).lower()
         
         if query:
             # They provided preferences right in the command so interpret it directly
@@ -508,7 +555,8 @@ class TelegramRouter:
         
         if handler:
             logger.info(
-                f"Routing to callback handler: {action}",
+                "Routing to callback handler: %s",
+                action,
                 extra={"request_id": request_id, "action": action}
             )
             return await handler(
@@ -518,7 +566,7 @@ class TelegramRouter:
                 request_id
             )
         else:
-            logger.warning(f"Unknown callback action: {action}")
+            logger.warning("Unknown callback action: %s", action)
             return {
                 "type": "text",
                 "content": f"Unknown action: {action}"
@@ -541,19 +589,9 @@ class TelegramRouter:
             [{"text": "My Profile"}, {"text": "Find Matches"}]
         ]
         
-        content = (
-            "Hey, I’m Milo ☕️\n\n"
-            "I’m here to help you find people you’ll actually click with through shared interests, intentions, and real-life events.\n\n"
-            "Think: gym buddy, study buddy, event buddy, hobby friend - whatever fits where you’re at right now.\n\n"
-            "I’ll get to know you a little first so I can suggest the right people, communities, and events for you.\n\n"
-            "Your profile stays private - nothing is shown publicly.\n\n"
-            "Join our announcement channel to keep in touch with the changes we bring to Milo - \n\n"
-            "First, let’s build your profile. Hit /profile command to set up your profile"
-        )
-            
         return {
             "type": "text",
-            "content": content,
+            "content": _WELCOME_TEXT,
             "keyboard": keyboard
         }
     
@@ -583,23 +621,13 @@ class TelegramRouter:
         # Check if user wants a new setup
         if "setup" in text.lower():
             await self.session_manager.set_persistent_state(telegram_user_id, "AWAITING_PROFILE_NAME")
-            return {
-                "type": "text", 
-                "content": "Let’s build your Milo profile 👋\n"
-                           "I’ll keep this quick. Your answers will stay private and help me suggest better people, communities, and events.\n\n"
-                           "First - what should I call you?"
-            }
+            return {"type": "text", "content": _PROFILE_SETUP_TEXT}
             
         # Get profile from DB
         is_onboarded = await self.api_client.database.get_onboarding_status(telegram_user_id)
         if not is_onboarded:
             await self.session_manager.set_persistent_state(telegram_user_id, "AWAITING_PROFILE_NAME")
-            return {
-                "type": "text", 
-                "content": "Let’s build your Milo profile 👋\n"
-                           "I’ll keep this quick. Your answers will stay private and help me suggest better people, communities, and events.\n\n"
-                           "First - what should I call you?"
-            }
+            return {"type": "text", "content": _PROFILE_SETUP_TEXT}
             
         # Build Profile Card
         profile = await self.api_client.database.get_user_profile(telegram_user_id)
@@ -640,12 +668,7 @@ class TelegramRouter:
     ) -> Optional[Dict[str, Any]]:
         """Handle PROFILE_EDIT callback."""
         await self.session_manager.set_persistent_state(telegram_user_id, "AWAITING_PROFILE_NAME")
-        return {
-            "type": "text",
-            "content": "Let’s build your Milo profile 👋\n"
-                       "I’ll keep this quick. Your answers will stay private and help me suggest better people, communities, and events.\n\n"
-                       "First - what should I call you?"
-        }
+        return {"type": "text", "content": _PROFILE_SETUP_TEXT}
     
     async def _handle_generate_command(
         self,
@@ -665,7 +688,7 @@ class TelegramRouter:
             }
             
         # Strip command to get prompt
-        prompt = text.replace("/generate", "", 1).strip()
+        prompt = _strip_command(text)
         
         if not prompt:
             return {
@@ -686,12 +709,7 @@ class TelegramRouter:
         request_id: str
     ) -> Optional[Dict[str, Any]]:
         """Handle /clear command."""
-        return await self.api_client.call_user_profile(
-            telegram_user_id,
-            "/clear",
-            request_id,
-            chat_id=chat_id
-        )
+        return await self.api_client.call_ai_clear(chat_id, request_id)
 
     async def _handle_end_command(
         self,
@@ -704,7 +722,7 @@ class TelegramRouter:
         state = await self.session_manager.get_persistent_state(telegram_user_id)
         if state and str(state).startswith("IN_CHAT:"):
             target_tg_id = int(str(state).split(":")[1])
-            logger.info(f"🚪 [CHAT ROOM CLOSED] User {telegram_user_id} explicitly left chat room with {target_tg_id}.")
+            logger.info("🚪 [CHAT ROOM CLOSED] User %s explicitly left chat room with %s.", telegram_user_id, target_tg_id)
             
             # Break locks
             await self.session_manager.set_persistent_state(telegram_user_id, None)
@@ -785,38 +803,39 @@ class TelegramRouter:
                 ]
             }
             
-        content = "🔗 **Your Connections & Requests**\n\n"
+        # Collect lines and join once; connection lists grow without bound
+        parts = ["🔗 **Your Connections & Requests**\n\n"]
         buttons = []
         
         if all_connections:
-            content += "🤝 **Established Connections:**\n"
+            parts.append("🤝 **Established Connections:**\n")
             for conn in all_connections:
                 other_name = conn['other_name']
                 other_id = conn['other_id']
-                content += f"• **{other_name}**\n"
+                parts.append(f"• **{other_name}**\n")
                 buttons.append([
                     {"text": f"👤 Profile: {other_name}", "callback_data": f"VIEW_PROFILE:{other_id}"},
                     {"text": f"💬 Chat: {other_name}", "callback_data": f"START_CHAT:{other_id}"}
                 ])
-            content += "\n"
+            parts.append("\n")
 
         if incoming:
-            content += "📩 **Incoming Requests:**\n"
+            parts.append("📩 **Incoming Requests:**\n")
             for req in incoming:
                 from_name = req.get("from_name", "Someone")
                 from_id = req.get("from_user_id")
-                content += f"• **{from_name}** wants to connect\n"
+                parts.append(f"• **{from_name}** wants to connect\n")
                 buttons.append([
                     {"text": f"✅ Accept {from_name}", "callback_data": f"ACCEPT:{from_id}"},
                     {"text": f"❌ Reject {from_name}", "callback_data": f"REJECT:{from_id}"}
                 ])
             
         if outgoing:
-            content += "📤 **Outgoing Requests:**\n"
+            parts.append("📤 **Outgoing Requests:**\n")
             for req in outgoing:
                 to_name = req.get("to_name", "Someone")
                 to_id = req.get("to_user_id")
-                content += f"• Sent to **{to_name}** ({req['status']})\n"
+                parts.append(f"• Sent to **{to_name}** ({req['status']})\n")
                 buttons.append([
                     {"text": f"👤 View {to_name}", "callback_data": f"VIEW_PROFILE:{to_id}"},
                     {"text": f"🚫 Cancel", "callback_data": f"CANCEL_REQUEST:{to_id}"}
@@ -824,7 +843,7 @@ class TelegramRouter:
                 
         return {
             "type": "text",
-            "content": content,
+            "content": "".join(parts),
             "buttons": buttons if buttons else None,
             "keyboard": [
                 [{"text": "My Profile"}],
@@ -953,7 +972,9 @@ class TelegramRouter:
         mime_type = document.get("mime_type", "")
         
         logger.info(
-            f"Received document: {file_name} ({mime_type})",
+            "Received document: %s (%s)",
+            file_name,
+            mime_type,
             extra={"request_id": request_id, "file": file_name}
         )
         
@@ -981,7 +1002,7 @@ class TelegramRouter:
         request_id: str
     ) -> Optional[Dict[str, Any]]:
         """Handle INTENT selection callback."""
-        if getattr(self.api_client, "database", None):
+        if self.api_client.database:
             await self.api_client.database.update_user_preferences(telegram_user_id, {"connection_intent": param or "Exploring"})
         
         await self.session_manager.set_persistent_state(telegram_user_id, "AWAITING_PROFILE_LOCATION")
@@ -1002,7 +1023,7 @@ class TelegramRouter:
         request_id: str
     ) -> Optional[Dict[str, Any]]:
         """Handle Singapore LOCATION selection callback."""
-        if getattr(self.api_client, "database", None):
+        if self.api_client.database:
             await self.api_client.database.update_user_profile_field(telegram_user_id, "location", param or "Singapore")
             await self.api_client.database.set_onboarding_status(telegram_user_id, True)
             
@@ -1024,7 +1045,7 @@ class TelegramRouter:
         request_id: str
     ) -> Optional[Dict[str, Any]]:
         """Handle GENDER selection callback."""
-        if getattr(self.api_client, "database", None):
+        if self.api_client.database:
             gender = param or "Other"
             await self.api_client.database.update_user_profile_field(telegram_user_id, "gender", gender)
             
@@ -1053,7 +1074,7 @@ class TelegramRouter:
             
         photo_id = photos[-1]["file_id"]
         
-        if getattr(self.api_client, "database", None):
+        if self.api_client.database:
             await self.api_client.database.update_user_profile_field(telegram_user_id, "photo_id", photo_id)
             
         return {
@@ -1124,7 +1145,7 @@ class TelegramRouter:
                 request_id
             )
         except Exception as e:
-            logger.error(f"Failed to notify requester {target_id}: {e}")
+            logger.error("Failed to notify requester %s: %s", target_id, e)
             
         # 2. Return response to Approver (Person B)
         return {
@@ -1221,15 +1242,15 @@ class TelegramRouter:
         b_message = f"🔔 **New Connection Request!**\n\n**{requester_name}** wants to connect with you. Would you like to accept?"
         b_markup = {
             "inline_keyboard": [[
-                {"text": "✅ Approve", "callback_data": f"ACCEPT:{telegram_user_id}|{requester_name}"},
-                {"text": "❌ Reject", "callback_data": f"REJECT:{telegram_user_id}|{requester_name}"}
+                {"text": "✅ Approve", "callback_data": clip_callback_data(f"ACCEPT:{telegram_user_id}|{requester_name}")},
+                {"text": "❌ Reject", "callback_data": clip_callback_data(f"REJECT:{telegram_user_id}|{requester_name}")}
             ]]
         }
         
         try:
             await self.api_client.send_direct_message(target_id, b_message, reply_markup=b_markup)
         except Exception as e:
-            logger.error(f"Failed to notify target {target_id} of request from {telegram_user_id}: {e}")
+            logger.error("Failed to notify target %s of request from %s: %s", target_id, telegram_user_id, e)
 
         # 3. Inform the requester (Person A)
         return {
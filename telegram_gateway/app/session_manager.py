@@ -1,11 +1,11 @@
 """
 Redis-based session management for user sessions.
 """
-import json
 from typing import Optional, Dict, Any
 from datetime import datetime
 import logging
 
+import orjson
 import redis.asyncio as redis
 from redis.exceptions import RedisError
 
@@ -74,12 +74,12 @@ class SessionManager:
                 
                 if session_data:
                     try:
-                        session = json.loads(session_data)
+                        session = orjson.loads(session_data)
                         # Refresh TTL on activity
                         await self.redis_client.expire(key, self.session_ttl)
                         logger.info(f"Session retrieved from Redis for telegram_user_id={telegram_user_id}")
                         return session
-                    except json.JSONDecodeError as e:
+                    except orjson.JSONDecodeError as e:
                         logger.error(f"Failed to decode session data: {e}")
                         # Continue to DB fallback
             except RedisError as e:
@@ -142,7 +142,7 @@ class SessionManager:
                 await self.redis_client.setex(
                     key,
                     self.session_ttl,
-                    json.dumps(session_data)
+                    orjson.dumps(session_data)
                 )
                 logger.info(f"Session created in Redis for telegram_user_id={telegram_user_id}")
             except RedisError as e:
@@ -182,7 +182,7 @@ class SessionManager:
             await self.redis_client.setex(
                 key,
                 self.session_ttl,
-                json.dumps(session)
+                orjson.dumps(session)
             )
             return True
         except RedisError as e:
@@ -12,6 +12,8 @@ TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET")
 # Use 127.0.0.1 to avoid ipv6 loading issues on some macs
 GATEWAY_URL = "http://127.0.0.1:8000/webhook/telegram"
+# Long-poll duration in seconds; Telegram holds getUpdates open this long when idle
+POLL_TIMEOUT = int(os.getenv("POLL_TIMEOUT", "30"))
 
 if not TOKEN:
     print("❌ Error: TELEGRAM_BOT_TOKEN not found in .env")
@@ -35,6 +37,23 @@ async def forward_update(client, update):
     except Exception as e:
         print(f"❌ Failed to forward update {update_id}: {e}")
 
+def _update_user_id(update):
+    """Best-effort sender ID of an update, used to keep per-user ordering."""
+    source = update.get("message") or update.get("callback_query") or {}
+    return source.get("from", {}).get("id")
+
+async def forward_updates(client, updates):
+    """Forward a batch concurrently across users, in order within each user."""
+    by_user = {}
+    for update in updates:
+        by_user.setdefault(_update_user_id(update), []).append(update)
+
+    async def forward_in_order(user_updates):
+        for update in user_updates:
+            await forward_update(client, update)
+
+    await asyncio.gather(*(forward_in_order(u) for u in by_user.values()))
+
 async def main():
     print(f"🚀 Starting Local Poller Bridge...")
     print(f"📥 Polling Telegram -> Forwarding to {GATEWAY_URL}")
@@ -60,13 +79,13 @@ async def main():
             try:
                 # Use a new client for each long-poll to avoid connection reuse issues
                 # with some ISPs/DNS when holding connections open for 30s
-                async with httpx.AsyncClient(timeout=40.0) as poll_client:
+                async with httpx.AsyncClient(timeout=POLL_TIMEOUT + 10.0) as poll_client:
                     try:
                         response = await poll_client.get(
                             f"https://api.telegram.org/bot{TOKEN}/getUpdates",
                             params={
                                 "offset": offset,
-                                "timeout": 30,
+                                "timeout": POLL_TIMEOUT,
                                 "allowed_updates": ["message", "callback_query"]
                             }
                         )
@@ -80,11 +99,12 @@ async def main():
 
                         updates = data.get("result", [])
                         
-                        for update in updates:
-                            # Forward locally
-                            await forward_update(poll_client, update)
-                            # Confirm we processed it
-                            offset = update["update_id"] + 1
+                        # Forward locally over the long-lived client so the
+                        # gateway connection is kept alive across polls
+                        await forward_updates(client, updates)
+                        # Confirm we processed the batch
+                        if updates:
+                            offset = updates[-1]["update_id"] + 1
                             
                     except httpx.TimeoutException:
                         # Timeout is normal for long polling, just continue
@@ -0,0 +1,943 @@
+"""Unit tests for the internal API client."""
+import asyncio
+import httpx
+import orjson
+import pytest
+from app.api_client import (
+    InternalAPIClient,
+    _detect_gender_preference,
+    _format_reason,
+    _normalize_matches,
+    _service_limits,
+    _summarize_payload,
+    telegram_client_options,
+)
+from app.config import Settings
+
+
+@pytest.fixture
+def api_client():
+    """Create API client for testing."""
+    return InternalAPIClient(Settings(
+        TELEGRAM_BOT_TOKEN="test_token",
+        TELEGRAM_WEBHOOK_SECRET="test_secret",
+        CONVERSATION_SERVICE_URL="http://ai.internal:8000",
+        NOTIFICATION_SERVICE_URL="http://notify.internal:8004",
+        HTTPX_PREWARM=False,
+    ))
+
+
+class TestGenderPreference:
+    """Test gender preference extraction from free text."""
+
+    @pytest.mark.parametrize("text,expected", [
+        ("Looking for a female hiking partner", "Female"),
+        ("Any girls into climbing?", "Female"),
+        ("A guy to play football with", "Male"),
+        ("MEN only please", "Male"),
+        ("Anyone who likes jazz", "Everyone"),
+        ("no any preference really", "Everyone"),
+    ])
+    def test_detects_preference(self, text, expected):
+        """Test keywords map to the right preference."""
+        assert _detect_gender_preference(text) == expected
+
+    def test_female_takes_precedence(self):
+        """Test Female wins when several preferences are mentioned."""
+        assert _detect_gender_preference("guys or girls, both fine") == "Female"
+
+    @pytest.mark.parametrize("text", [
+        "I want a mentor for my startup",
+        "Looking for a product manager",
+        "Someone human and kind",
+        "",
+    ])
+    def test_ignores_embedded_substrings(self, text):
+        """Test keywords inside other words do not match."""
+        assert _detect_gender_preference(text) is None
+
+
+class TestClientSurface:
+    """Test the client exposes every call the router depends on."""
+
+    @pytest.mark.parametrize("method", [
+        "call_ai_chat", "call_ai_generate", "call_ai_interpret", "call_ai_clear",
+        "call_vector_upsert", "call_user_profile", "call_matching", "call_notification",
+        "send_direct_message",
+    ])
+    def test_method_defined(self, method):
+        """Test the method exists on the single InternalAPIClient definition."""
+        assert callable(getattr(InternalAPIClient, method, None))
+
+
+class TestServiceClients:
+    """Test per-service HTTP client routing."""
+
+    async def test_connect_creates_client_per_service(self, api_client):
+        """Test connect builds one client per downstream service."""
+        await api_client.connect()
+        try:
+            assert set(api_client.clients) == {"conversation", "user_profile", "matching", "notification"}
+            assert api_client.clients["conversation"].base_url.host == "ai.internal"
+            assert api_client.telegram_client.base_url.host == "api.telegram.org"
+        finally:
+            await api_client.disconnect()
+        assert api_client.clients == {}
+        assert api_client.telegram_client is None
+
+    async def test_direct_messages_reuse_the_telegram_client(self, api_client):
+        """Test DMs go through the shared Bot API client with a JSON body."""
+        seen = []
+
+        def handler(request):
+            seen.append((request.url.path, orjson.loads(request.content)))
+            return httpx.Response(200, json={"ok": True})
+
+        api_client.telegram_client = httpx.AsyncClient(
+            base_url="https://api.telegram.org",
+            transport=httpx.MockTransport(handler)
+        )
+        assert await api_client.send_direct_message(42, "hi", parse_mode="HTML")
+        assert await api_client.send_direct_message(43, "hey")
+
+        assert seen[0] == ("/bottest_token/sendMessage", {"chat_id": 42, "text": "hi", "parse_mode": "HTML"})
+        assert len(seen) == 2
+
+    async def test_bot_api_settings_come_from_config(self):
+        """Test the Bot API client takes its timeout from settings and DMs do not override it."""
+        settings = Settings(
+            TELEGRAM_BOT_TOKEN="t",
+            TELEGRAM_WEBHOOK_SECRET="s",
+            TELEGRAM_TIMEOUT=7.0,
+            TELEGRAM_CONNECT_TIMEOUT=1.5,
+        )
+        options = telegram_client_options(settings)
+        assert options["timeout"] == httpx.Timeout(7.0, connect=1.5)
+        await options["transport"].aclose()
+
+        seen = []
+
+        def handler(request):
+            seen.append(request.extensions["timeout"])
+            return httpx.Response(200, json={"ok": True})
+
+        client = InternalAPIClient(settings)
+        client.telegram_client = httpx.AsyncClient(
+            base_url="https://api.telegram.org",
+            timeout=options["timeout"],
+            transport=httpx.MockTransport(handler)
+        )
+        assert await client.send_direct_message(42, "hi")
+        assert seen == [{"connect": 1.5, "read": 7.0, "write": 7.0, "pool": 7.0}]
+
+    def test_pool_sizes_follow_settings(self):
+        """Test the conversation pool is the configured one and the others are smaller."""
+        limits = _service_limits(Settings(
+            TELEGRAM_BOT_TOKEN="t",
+            TELEGRAM_WEBHOOK_SECRET="s",
+            HTTPX_MAX_CONNECTIONS=400,
+            HTTPX_MAX_KEEPALIVE=50,
+        ))
+        assert limits["conversation"].max_connections == 400
+        assert limits["conversation"].max_keepalive_connections == 50
+        assert limits["matching"].max_connections == 100
+        assert limits["matching"].max_keepalive_connections == 10
+
+    @pytest.mark.parametrize("service,path,expected_url", [
+        ("conversation", "/conversation/interpret", "http://ai.internal:8000/conversation/interpret"),
+    ])
+    async def test_make_request_uses_service_base_url(self, api_client, service, path, expected_url):
+        """Test relative paths resolve against the service's base URL."""
+        seen = []
+
+        def handler(request):
+            seen.append(str(request.url))
+            assert orjson.loads(request.content) == {"user_id": "1"}
+            return httpx.Response(200, json={"ok": True})
+
+        api_client.clients[service] = httpx.AsyncClient(
+            base_url=api_client.service_urls[service],
+            transport=httpx.MockTransport(handler)
+        )
+        result = await api_client._make_request(service, path, {"user_id": "1"}, 5, "Test", "req")
+
+        assert result == {"ok": True}
+        assert seen == [expected_url]
+
+    @pytest.mark.parametrize("url", ["http://notify.internal:8004", "http://notify.internal:8004/notify"])
+    async def test_notification_posts_configured_url(self, url):
+        """Test notifications go to the configured URL verbatim, with no trailing slash added."""
+        client = InternalAPIClient(Settings(
+            TELEGRAM_BOT_TOKEN="t",
+            TELEGRAM_WEBHOOK_SECRET="s",
+            NOTIFICATION_SERVICE_URL=url,
+        ))
+        seen = []
+
+        def handler(request):
+            seen.append(str(request.url))
+            return httpx.Response(200, json={"ok": True})
+
+        client.clients["notification"] = httpx.AsyncClient(
+            base_url=url, transport=httpx.MockTransport(handler)
+        )
+        assert await client.call_notification("user_1", "match", "req") == {"ok": True}
+        assert seen == [url]
+
+    @pytest.mark.parametrize("coalesce", [False, True])
+    async def test_unserializable_payload_fails_soft(self, api_client, coalesce):
+        """Test a payload orjson cannot encode returns None without a request."""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, json={})
+
+        api_client.clients["conversation"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["conversation"],
+            transport=httpx.MockTransport(handler)
+        )
+        # e.g. an ObjectId read back from Mongo preferences
+        payload = {"data": {"entities": {"ref": object()}}}
+        result = await api_client._make_request(
+            "conversation", "/conversation/vector", payload, 5, "Test", "req", coalesce=coalesce
+        )
+
+        assert result is None
+        assert calls == []
+
+    async def test_timeouts_are_split_per_phase(self, api_client):
+        """Test the call's timeout only bounds the read; other phases use the short settings."""
+        seen = []
+
+        def handler(request):
+            seen.append(request.extensions["timeout"])
+            return httpx.Response(200, json={})
+
+        api_client.clients["conversation"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["conversation"],
+            transport=httpx.MockTransport(handler)
+        )
+        await api_client._make_request("conversation", "/chat", {}, 60, "Test", "req")
+
+        assert seen == [{"connect": 1.0, "read": 60, "write": 2.0, "pool": 1.0}]
+
+    async def test_prewarm_tolerates_unreachable_services(self, api_client):
+        """Test pre-warming touches every service and never raises."""
+        seen = []
+
+        def handler(request):
+            seen.append(request.method)
+            if request.url.host == "notify.internal":
+                raise httpx.ConnectError("refused", request=request)
+            return httpx.Response(200)
+
+        for service, base_url in api_client.service_urls.items():
+            api_client.clients[service] = httpx.AsyncClient(
+                base_url=base_url, transport=httpx.MockTransport(handler)
+            )
+        await api_client._prewarm()
+
+        assert seen == ["HEAD"] * 4
+
+    async def test_make_request_without_client(self, api_client):
+        """Test calls before connect fail soft."""
+        assert await api_client._make_request("matching", "/x", {}, 5, "Test", "req") is None
+
+
+class TestRequestRecording:
+    """Test api_requests telemetry writes."""
+
+    async def test_record_is_written_off_the_response_path(self, api_client):
+        """Test the call returns before the DB write finishes and disconnect flushes it."""
+        release = asyncio.Event()
+        stored = []
+
+        class SlowDatabase:
+            async def store_api_requests(self, records):
+                await release.wait()
+                stored.extend(records)
+
+        api_client.database = SlowDatabase()
+        api_client.clients["conversation"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["conversation"],
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"ok": True}))
+        )
+        result = await api_client._make_request("conversation", "/chat", {}, 5, "Test", "req")
+
+        assert result == {"ok": True}
+        assert stored == []
+
+        release.set()
+        await api_client.disconnect()
+        assert stored[0]["status_code"] == 200
+        assert "timestamp" in stored[0]
+        assert api_client._record_worker is None
+
+    def test_payload_is_summarized(self):
+        """Test the stored payload is a digest with a bounded preview, not the body."""
+        body = orjson.dumps({"prompt": "x" * 5000})
+        summary = _summarize_payload(body)
+        assert summary["size"] == len(body)
+        assert len(summary["sha256"]) == 64
+        assert summary["preview"] == body[:256].decode()
+
+    async def test_records_are_written_in_batches(self, api_client):
+        """Test concurrent calls share one bulk insert."""
+        batches = []
+
+        class RecordingDatabase:
+            async def store_api_requests(self, records):
+                batches.append(records)
+
+        api_client.database = RecordingDatabase()
+        api_client.clients["conversation"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["conversation"],
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"ok": True}))
+        )
+        await asyncio.gather(*(
+            api_client._make_request("conversation", "/chat", {"n": n}, 5, "Test", f"req-{n}")
+            for n in range(5)
+        ))
+        await api_client.disconnect()
+
+        assert len(batches) == 1
+        assert sorted(record["request_id"] for record in batches[0]) == [f"req-{n}" for n in range(5)]
+
+    async def test_stalled_database_never_blocks_calls(self, api_client, monkeypatch):
+        """Test records are dropped once the queue is full and shutdown stops waiting."""
+        class StalledDatabase:
+            async def store_api_requests(self, records):
+                await asyncio.Event().wait()
+
+        monkeypatch.setattr("app.api_client._RECORD_DRAIN_TIMEOUT", 0.01)
+        api_client.database = StalledDatabase()
+        api_client._record_queue = asyncio.Queue(1)
+        api_client._record_request(request_id="first")
+        api_client._record_request(request_id="second")
+
+        assert api_client._record_queue.qsize() == 1
+        await api_client.disconnect()
+        assert api_client._record_worker is None
+
+
+class TestStaticProfileReplies:
+    """Test cached user-profile command replies."""
+
+    async def test_help_reply_is_a_fresh_copy(self, api_client):
+        """Test callers can mutate the reply without touching the shared constant."""
+        first = await api_client.call_user_profile(1, "/help", "req")
+        first["type"] = "reset_session"
+        second = await api_client.call_user_profile(1, "/help", "req")
+        assert second["type"] == "text"
+
+    async def test_profile_reply_includes_user_id(self, api_client):
+        """Test the profile template is filled per user."""
+        response = await api_client.call_user_profile(4242, "/profile", "req")
+        assert response["content"].endswith("ID: 4242")
+        assert response["internal_user_id"] == "user_4242"
+
+    @pytest.mark.parametrize("command,expected", [
+        ("/matches", "❤️ **Your Matches**"),
+        ("FILE:cv.pdf", "📄 **Resume Received**: `cv.pdf`"),
+        ("/nope", "Unknown command"),
+    ])
+    async def test_command_dispatch(self, api_client, command, expected):
+        """Test commands, file uploads and unknown input reach the right reply."""
+        response = await api_client.call_user_profile(1, command, "req")
+        assert response["content"].startswith(expected)
+
+    async def test_clear_reply_is_a_fresh_copy(self, api_client):
+        """Test the gateway's rewrite of the reset reply does not leak into later calls."""
+        first = await api_client.call_ai_clear("chat", "req")
+        first["type"] = "text"
+        second = await api_client.call_ai_clear("chat", "req")
+        assert second["type"] == "system_action"
+        assert second["action"] == "reset_session"
+
+
+class TestRetries:
+    """Test downstream retry behaviour."""
+
+    async def test_retries_with_backoff_until_success(self, api_client, monkeypatch):
+        """Test transient failures are retried with a bounded sleep in between."""
+        statuses = [503, 503, 200]
+        sleeps = []
+
+        async def fake_sleep(delay):
+            sleeps.append(delay)
+
+        def handler(request):
+            status = statuses.pop(0)
+            return httpx.Response(status, json={"ok": status == 200})
+
+        monkeypatch.setattr("app.api_client.asyncio.sleep", fake_sleep)
+        api_client.clients["conversation"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["conversation"],
+            transport=httpx.MockTransport(handler)
+        )
+        result = await api_client._make_request("conversation", "/chat", {}, 5, "Test", "req")
+
+        assert result == {"ok": True}
+        assert len(sleeps) == 2
+        assert all(0 < delay <= 1.0 for delay in sleeps)
+
+    async def test_backoff_bounds_come_from_settings(self, monkeypatch):
+        """Test every retry sleep stays within the configured delay bounds."""
+        sleeps = []
+
+        async def fake_sleep(delay):
+            sleeps.append(delay)
+
+        client = InternalAPIClient(Settings(
+            TELEGRAM_BOT_TOKEN="t",
+            TELEGRAM_WEBHOOK_SECRET="s",
+            RETRY_MAX_ATTEMPTS=4,
+            RETRY_BASE_DELAY=0.2,
+            RETRY_MAX_DELAY=0.3,
+        ))
+        monkeypatch.setattr("app.api_client.asyncio.sleep", fake_sleep)
+        client.clients["conversation"] = httpx.AsyncClient(
+            base_url=client.service_urls["conversation"],
+            transport=httpx.MockTransport(lambda request: httpx.Response(503, json={}))
+        )
+        await client._make_request("conversation", "/chat", {}, 5, "Test", "req")
+
+        assert len(sleeps) == 3
+        assert all(0.2 <= delay <= 0.3 for delay in sleeps)
+
+    @pytest.mark.parametrize("status,expected_calls", [(400, 1), (404, 1), (429, 3), (500, 3)])
+    async def test_only_server_errors_are_retried(self, api_client, monkeypatch, status, expected_calls):
+        """Test 4xx responses fail immediately while 5xx use every attempt."""
+        calls = []
+
+        async def fake_sleep(delay):
+            pass
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(status, json={})
+
+        monkeypatch.setattr("app.api_client.asyncio.sleep", fake_sleep)
+        api_client.clients["conversation"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["conversation"],
+            transport=httpx.MockTransport(handler)
+        )
+        result = await api_client._make_request("conversation", "/chat", {}, 5, "Test", "req")
+
+        assert result is None
+        assert len(calls) == expected_calls
+
+    async def test_transport_errors_are_retried(self, api_client, monkeypatch):
+        """Test connection-level failures are retried."""
+        calls = []
+
+        async def fake_sleep(delay):
+            pass
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                raise httpx.ConnectError("connection refused", request=request)
+            return httpx.Response(200, json={"ok": True})
+
+        monkeypatch.setattr("app.api_client.asyncio.sleep", fake_sleep)
+        api_client.clients["conversation"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["conversation"],
+            transport=httpx.MockTransport(handler)
+        )
+        result = await api_client._make_request("conversation", "/chat", {}, 5, "Test", "req")
+
+        assert result == {"ok": True}
+        assert len(calls) == 2
+
+    @pytest.mark.parametrize("retry_after,expected_calls,expected_sleep", [("2", 2, 2.0), ("60", 1, None)])
+    async def test_429_honours_retry_after(self, api_client, monkeypatch, retry_after, expected_calls, expected_sleep):
+        """Test a short Retry-After is waited out and a long one abandons the call."""
+        calls = []
+        sleeps = []
+
+        async def fake_sleep(delay):
+            sleeps.append(delay)
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(429, headers={"Retry-After": retry_after}, json={})
+            return httpx.Response(200, json={"ok": True})
+
+        monkeypatch.setattr("app.api_client.asyncio.sleep", fake_sleep)
+        api_client.clients["conversation"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["conversation"],
+            transport=httpx.MockTransport(handler)
+        )
+        await api_client._make_request("conversation", "/chat", {}, 5, "Test", "req")
+
+        assert len(calls) == expected_calls
+        assert sleeps == ([expected_sleep] if expected_sleep else [])
+
+
+class TestCircuitBreaker:
+    """Test fail-fast behaviour for a failing service."""
+
+    async def test_circuit_opens_after_repeated_failures(self, api_client, monkeypatch):
+        """Test calls stop reaching a service once the failure threshold is hit."""
+        calls = []
+
+        async def fake_sleep(delay):
+            pass
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503, json={})
+
+        monkeypatch.setattr("app.api_client.asyncio.sleep", fake_sleep)
+        api_client.clients["conversation"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["conversation"],
+            transport=httpx.MockTransport(handler)
+        )
+        for _ in range(5):
+            await api_client._make_request("conversation", "/chat", {}, 5, "Test", "req")
+        # Five failed calls of three attempts each; the circuit counts calls, not attempts
+        assert len(calls) == 15
+        assert api_client._breakers["Test"]["fails"] == 5
+
+        result = await api_client._make_request("conversation", "/chat", {}, 5, "Test", "req")
+        assert result is None
+        assert len(calls) == 15
+
+    async def test_failing_endpoint_does_not_trip_others(self, api_client, monkeypatch):
+        """Test an open circuit for one endpoint leaves others on the same host alone."""
+        async def fake_sleep(delay):
+            pass
+
+        def handler(request):
+            if request.url.path == "/generate":
+                return httpx.Response(503, json={})
+            return httpx.Response(200, json={"ok": True})
+
+        monkeypatch.setattr("app.api_client.asyncio.sleep", fake_sleep)
+        api_client.clients["conversation"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["conversation"],
+            transport=httpx.MockTransport(handler)
+        )
+        for _ in range(5):
+            await api_client._make_request("conversation", "/generate", {}, 5, "AIService/Generate", "req")
+
+        assert api_client._circuit_open("AIService/Generate")
+        result = await api_client._make_request("conversation", "/chat", {}, 5, "AIService/Chat", "req")
+        assert result == {"ok": True}
+
+    async def test_success_resets_failure_count(self, api_client, monkeypatch):
+        """Test a successful response clears earlier failures."""
+        statuses = [503, 503, 200]
+
+        async def fake_sleep(delay):
+            pass
+
+        def handler(request):
+            return httpx.Response(statuses.pop(0), json={})
+
+        monkeypatch.setattr("app.api_client.asyncio.sleep", fake_sleep)
+        api_client.clients["conversation"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["conversation"],
+            transport=httpx.MockTransport(handler)
+        )
+        await api_client._make_request("conversation", "/chat", {}, 5, "Test", "req")
+
+        assert api_client._breakers["Test"]["fails"] == 0
+        assert not api_client._circuit_open("Test")
+
+    async def test_half_open_lets_one_probe_through(self, api_client, monkeypatch):
+        """Test only one caller probes after the cooldown and its success closes the circuit."""
+        now = [1000.0]
+        monkeypatch.setattr("app.api_client.time.monotonic", lambda: now[0])
+        breaker = api_client._breaker("conversation")
+        for _ in range(5):
+            api_client._record_failure("conversation")
+        assert api_client._circuit_open("conversation")
+
+        now[0] += 30
+        assert not api_client._circuit_open("conversation")
+        assert api_client._circuit_open("conversation")
+
+        api_client._record_success("conversation")
+        assert breaker["fails"] == 0
+        assert not api_client._circuit_open("conversation")
+
+    async def test_failed_probe_reopens_circuit(self, api_client, monkeypatch):
+        """Test a failing probe starts a fresh cooldown."""
+        now = [1000.0]
+        monkeypatch.setattr("app.api_client.time.monotonic", lambda: now[0])
+        for _ in range(5):
+            api_client._record_failure("conversation")
+
+        now[0] += 30
+        assert not api_client._circuit_open("conversation")
+        api_client._record_failure("conversation")
+        now[0] += 29
+        assert api_client._circuit_open("conversation")
+
+
+class TestBulkheads:
+    """Test per-endpoint concurrency caps."""
+
+    async def test_generate_calls_are_capped(self):
+        """Test no more than the configured number of /generate calls are in flight."""
+        in_flight = [0]
+        peak = [0]
+
+        async def handler(request):
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+            return httpx.Response(200, json={"ok": True})
+
+        client = InternalAPIClient(Settings(
+            TELEGRAM_BOT_TOKEN="t",
+            TELEGRAM_WEBHOOK_SECRET="s",
+            AI_GENERATE_CONCURRENCY=2,
+        ))
+        client.clients["conversation"] = httpx.AsyncClient(
+            base_url=client.service_urls["conversation"],
+            transport=httpx.MockTransport(handler)
+        )
+        results = await asyncio.gather(*(
+            client._make_request("conversation", "/generate", {}, 5, "AIService/Generate", "req")
+            for _ in range(6)
+        ))
+
+        assert results == [{"ok": True}] * 6
+        assert peak[0] == 2
+
+
+class TestCoalescing:
+    """Test in-flight request coalescing."""
+
+    async def test_identical_concurrent_requests_share_one_call(self, api_client):
+        """Test concurrent identical idempotent requests hit the backend once."""
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"ok": True})
+
+        api_client.clients["conversation"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["conversation"],
+            transport=httpx.MockTransport(handler)
+        )
+        results = await asyncio.gather(*[
+            api_client._make_request("conversation", "/conversation/vector", {"user_id": "1"}, 5, "Test", "req", coalesce=True)
+            for _ in range(3)
+        ])
+
+        assert results == [{"ok": True}] * 3
+        assert len(calls) == 1
+        assert api_client._inflight == {}
+
+    async def test_repeated_match_requests_share_one_call(self, api_client):
+        """Test rapid /matches taps for the same user reach the matching endpoint once."""
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"matches": []})
+
+        api_client.clients["conversation"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["conversation"],
+            transport=httpx.MockTransport(handler)
+        )
+        results = await asyncio.gather(*[
+            api_client.call_matching("chat", 1, "CONNECT", None, "req")
+            for _ in range(3)
+        ])
+
+        assert all(result["content"].startswith("No perfect matches") for result in results)
+        assert len(calls) == 1
+
+    async def test_vector_upserts_are_never_shared(self, api_client):
+        """Test identical concurrent upserts each reach the backend; writes are not coalesced."""
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"ok": True})
+
+        api_client.clients["conversation"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["conversation"],
+            transport=httpx.MockTransport(handler)
+        )
+        await asyncio.gather(*[
+            api_client.call_vector_upsert("chat", 1, {}, "hiking", "Milo", "req")
+            for _ in range(2)
+        ])
+
+        assert len(calls) == 2
+
+
+class TestInterpret:
+    """Test call_ai_interpret preference handling."""
+
+    async def test_detected_gender_survives_preference_merge(self, api_client):
+        """Test the gender write lands before preferences are read for merging."""
+
+        class FakeDatabase:
+            def __init__(self):
+                self.prefs = {"looking_for_gender": "Male", "interests": ["chess"]}
+
+            async def update_user_preferences(self, uid, prefs):
+                self.prefs.update(prefs)
+                return True
+
+            async def get_user_preferences(self, uid):
+                return dict(self.prefs)
+
+            async def get_user_profile(self, uid):
+                return None
+
+        def handler(request):
+            if request.url.path == "/conversation/interpret":
+                return httpx.Response(200, json={"entities": {"interests": ["hiking"]}, "reply": "Noted"})
+            return httpx.Response(200, json={})
+
+        api_client.database = FakeDatabase()
+        api_client.clients["conversation"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["conversation"],
+            transport=httpx.MockTransport(handler)
+        )
+        response = await api_client.call_ai_interpret(
+            "chat", 1, "a female hiking partner", "req", merge_preferences=True
+        )
+
+        assert api_client.database.prefs["looking_for_gender"] == "Female"
+        assert api_client.database.prefs["interests"] == ["chess", "hiking"]
+        assert response["content"].startswith("Noted")
+
+
+
+class TestGenerateCache:
+    """Test /generate response caching."""
+
+    @pytest.mark.parametrize("temperature,expected_calls", [(0.0, 1), (0.7, 2)])
+    async def test_cache_only_when_deterministic(self, temperature, expected_calls):
+        """Test repeated prompts are served from cache only at temperature 0."""
+        client = InternalAPIClient(Settings(
+            TELEGRAM_BOT_TOKEN="test_token",
+            TELEGRAM_WEBHOOK_SECRET="test_secret",
+            AI_TEMPERATURE=temperature,
+        ))
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, json={"response": "a story"})
+
+        client.clients["conversation"] = httpx.AsyncClient(
+            base_url=client.service_urls["conversation"],
+            transport=httpx.MockTransport(handler)
+        )
+        first = await client.call_ai_generate("a cat", "req")
+        first["content"] = "mutated"
+        second = await client.call_ai_generate("a cat", "req")
+
+        assert second == {"type": "text", "content": "a story"}
+        assert len(calls) == expected_calls
+
+
+class TestFallbacks:
+    """Test degraded replies while the AI service is down."""
+
+    @pytest.mark.parametrize("service_name,call", [
+        ("AIService/Chat", lambda client: client.call_ai_chat("chat", 1, "hello", "req")),
+        ("AIService/Generate", lambda client: client.call_ai_generate("a cat", "req")),
+    ])
+    async def test_canned_reply_when_ai_is_unavailable(self, api_client, service_name, call):
+        """Test an open circuit yields the canned reply without touching the network."""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, json={"response": "ok"})
+
+        api_client.clients["conversation"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["conversation"],
+            transport=httpx.MockTransport(handler)
+        )
+        for _ in range(5):
+            api_client._record_failure(service_name)
+
+        first = await call(api_client)
+        first["content"] = "mutated"
+        second = await call(api_client)
+
+        assert second["content"].startswith("I'm a bit overloaded")
+        assert calls == []
+
+    @pytest.mark.parametrize("status,overloaded", [(503, True), (429, True), (400, False), (422, False)])
+    async def test_canned_reply_only_for_outages(self, api_client, monkeypatch, status, overloaded):
+        """Test a rejected request keeps the generic error path instead of "try again"."""
+        async def fake_sleep(delay):
+            pass
+
+        def handler(request):
+            return httpx.Response(status, json={"detail": "nope"})
+
+        monkeypatch.setattr("app.api_client.asyncio.sleep", fake_sleep)
+        api_client.clients["conversation"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["conversation"],
+            transport=httpx.MockTransport(handler)
+        )
+        result = await api_client.call_ai_chat("chat", 1, "hello", "req")
+
+        if overloaded:
+            assert result["content"].startswith("I'm a bit overloaded")
+        else:
+            assert result is None
+
+    async def test_no_canned_reply_before_connect(self, api_client):
+        """Test a client that was never initialised is not reported as an outage."""
+        assert await api_client.call_ai_chat("chat", 1, "hello", "req") is None
+
+
+class TestMatching:
+    """Test call_matching's database access pattern."""
+
+    @pytest.mark.parametrize("result,expected", [
+        ([{"user_id": "1"}], [{"user_id": "1"}]),
+        ({"matches": []}, []),
+        ({"status": "processing"}, None),
+        (None, None),
+    ])
+    def test_normalize_matches(self, result, expected):
+        """Test every response shape the endpoint returns is reduced to a list or None."""
+        assert _normalize_matches(result) == expected
+
+    def test_format_reason(self):
+        """Test present entities are joined in a fixed order and empty ones skipped."""
+        reason = _format_reason({"role": "data scientist", "goals": [], "skills": ["sql", "ml"], "location": "Pune"})
+        assert reason == "Role: Data Scientist | Skills: sql, ml | Location: Pune"
+        assert _format_reason({}) == "A great potential connection based on your request!"
+
+    async def test_lookups_are_batched_and_loop_invariant(self, api_client):
+        """Test preferences load once and connected users are never looked up."""
+        calls = {"profile": [], "preferences": 0}
+
+        class FakeCursor:
+            def __init__(self, docs):
+                self.docs = list(docs)
+
+            def __aiter__(self):
+                return self
+
+            async def __anext__(self):
+                if not self.docs:
+                    raise StopAsyncIteration
+                return self.docs.pop(0)
+
+        class FakeConnections:
+            def find(self, query):
+                return FakeCursor([{"from_user_id": 1, "to_user_id": 2}])
+
+        class FakeDatabase:
+            db = type("DB", (), {"connections": FakeConnections()})()
+
+            async def get_user_preferences(self, uid):
+                calls["preferences"] += 1
+                return {"looking_for_gender": "Female"}
+
+            async def get_user_profile(self, uid):
+                calls["profile"].append(uid)
+                return {"1": {"gender": "Male"}, "3": {"name": "Ana", "gender": "Female"}, "4": {"name": "Bo", "gender": "Male"}}[str(uid)]
+
+            async def store_match_result(self, uid, result):
+                pass
+
+        def handler(request):
+            return httpx.Response(200, json={"matches": [
+                {"user_id": "2", "score": 0.9},
+                {"user_id": "3", "score": 0.8},
+                {"user_id": "4", "score": 0.7},
+            ]})
+
+        api_client.database = FakeDatabase()
+        api_client.clients["conversation"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["conversation"],
+            transport=httpx.MockTransport(handler)
+        )
+        response = await api_client.call_matching("chat", 1, "CONNECT", None, "req")
+
+        assert response["items"][0]["name"] == "Ana"
+        assert [item["user_id"] for item in response["items"]] == ["3"]
+        assert calls["preferences"] == 1
+        assert sorted(calls["profile"]) == [1, 3, 4]
+
+    async def test_accept_lookups_run_concurrently(self, api_client, monkeypatch):
+        """Test ACCEPT issues its profile, preference and connection calls together."""
+        in_flight = [0]
+        peak = [0]
+        sent = []
+
+        async def db_call(result):
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+            return result
+
+        class FakeCursor:
+            def __aiter__(self):
+                return self
+
+            async def __anext__(self):
+                raise StopAsyncIteration
+
+        class FakeDatabase:
+            db = type("DB", (), {"connections": type("C", (), {"find": lambda self, query: FakeCursor()})()})()
+
+            async def get_user_profile(self, uid):
+                return await db_call({1: {"name": "Me"}, 2: {"name": "Ana", "username": "ana"}}[uid])
+
+            async def get_user_preferences(self, uid):
+                return await db_call({"goals": ["hiking"]})
+
+            async def record_connection(self, from_id, to_id, status):
+                return await db_call(True)
+
+        async def fake_send(target, text, parse_mode="Markdown", reply_markup=None):
+            sent.append((target, text))
+            return True
+
+        api_client.database = FakeDatabase()
+        monkeypatch.setattr(api_client, "send_direct_message", fake_send)
+        api_client.clients["notification"] = httpx.AsyncClient(
+            base_url=api_client.service_urls["notification"],
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, json={}))
+        )
+        response = await api_client.call_matching("chat", 1, "ACCEPT", "user_2|Ana", "req")
+
+        assert response["content"].startswith("✅ Connected with Ana!")
+        assert response["buttons"][0][0]["url"] == "https://t.me/ana"
+        assert sent[0][0] == 2
+        assert "Goals: hiking" in sent[0][1]
+        assert peak[0] == 3
+
+    async def test_profiles_are_cached_between_calls(self, api_client):
+        """Test a repeated profile read is served from cache while a missing one is retried."""
+        calls = []
+
+        class FakeDatabase:
+            async def get_user_profile(self, uid):
+                calls.append(uid)
+                return {"name": "Ana"} if uid == 3 else None
+
+        api_client.database = FakeDatabase()
+        assert await api_client._cached_profile(3) == {"name": "Ana"}
+        assert await api_client._cached_profile(3) == {"name": "Ana"}
+        assert await api_client._cached_profile(5) is None
+        assert await api_client._cached_profile(5) is None
+
+        assert calls == [3, 5, 5]
@@ -0,0 +1,50 @@
+"""Unit tests for the in-process TTL cache."""
+import pytest
+from app import cache as cache_module
+from app.cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable monotonic clock."""
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+class TestTTLCache:
+    """Test expiry and eviction."""
+
+    def test_get_returns_stored_value(self, clock):
+        """Test a fresh entry is returned."""
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert cache.get("missing", "default") == "default"
+
+    def test_entries_expire(self, clock):
+        """Test entries disappear once their TTL has passed."""
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set("a", 1)
+        clock[0] += 10
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_least_recently_used_is_evicted(self, clock):
+        """Test the oldest untouched entry is dropped past maxsize."""
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_pop_invalidates(self, clock):
+        """Test pop removes the entry and returns its value."""
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set("a", 1)
+        assert cache.pop("a") == 1
+        assert cache.get("a") is None
+        assert cache.pop("a") is None
@@ -0,0 +1,219 @@
+"""Unit tests for the MongoDB persistence layer."""
+import asyncio
+import pytest
+from pymongo.errors import BulkWriteError, OperationFailure
+from app.database import Database
+
+
+class FakeMessages:
+    """Minimal stand-in for the messages collection."""
+
+    def __init__(self):
+        self.docs = []
+        self.batches = []
+
+    async def bulk_write(self, requests, ordered=True):
+        self.batches.append(len(requests))
+        errors = []
+        for i, op in enumerate(requests):
+            doc = op._doc
+            if doc in self.docs:
+                errors.append({"index": i, "code": 11000, "errmsg": "duplicate key"})
+            else:
+                self.docs.append(doc)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "writeConcernErrors": []})
+
+    def find(self, query, projection=None):
+        self.last_cursor = FakeCursor(
+            [d for d in self.docs if d["telegram_user_id"] == query["telegram_user_id"]],
+            projection,
+        )
+        return self.last_cursor
+
+    async def delete_many(self, query):
+        self.docs = [d for d in self.docs if d["telegram_user_id"] != query["telegram_user_id"]]
+
+    async def update_one(self, query, update, upsert=False):
+        if query not in self.docs:
+            self.docs.append(dict(query))
+
+
+class FakeCursor:
+    """Cursor that records the options the query was issued with."""
+
+    def __init__(self, docs, projection):
+        self.docs = docs
+        self.projection = projection
+        self.hinted = None
+
+    def hint(self, index):
+        self.hinted = index
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length):
+        fields = [k for k, v in (self.projection or {}).items() if v]
+        return [{k: d[k] for k in fields} if fields else d for d in self.docs]
+
+
+class FakeDB:
+    def __init__(self):
+        self.messages = FakeMessages()
+
+
+@pytest.fixture
+def database():
+    """Database wired to an in-memory messages collection."""
+    db = Database("mongodb://unused")
+    db.db = FakeDB()
+    return db
+
+
+class TestMessageBuffer:
+    """Test batched message-id tracking."""
+
+    async def test_messages_are_written_in_one_batch(self, database):
+        """Test buffered IDs reach the collection in a single bulk write."""
+        for mid in range(5):
+            assert await database.add_message(1, mid)
+        assert database.db.messages.docs == []
+
+        await database._flush_messages()
+        assert database.db.messages.batches == [5]
+        assert len(database.db.messages.docs) == 5
+
+    async def test_reads_see_buffered_messages(self, database):
+        """Test get_messages flushes the buffer before querying."""
+        await database.add_message(1, 10)
+        await database.add_message(2, 20)
+        assert await database.get_messages(1) == [10]
+
+    async def test_read_is_covered_by_the_index(self, database):
+        """Test only message_id is projected and the compound index is hinted."""
+        await database.add_message(1, 10)
+        await database.get_messages(1)
+        cursor = database.db.messages.last_cursor
+        assert cursor.projection == {"message_id": 1, "_id": 0}
+        assert cursor.hinted == [("telegram_user_id", 1), ("message_id", 1)]
+
+    async def test_clear_removes_buffered_messages(self, database):
+        """Test buffered IDs cannot reappear after a clear."""
+        await database.add_message(1, 10)
+        assert await database.clear_messages(1)
+        await database._flush_messages()
+        assert await database.get_messages(1) == []
+
+    async def test_unbuffered_ids_are_written_immediately(self, database):
+        """Test bot replies are stored before add_message returns, visible to every worker."""
+        assert await database.add_message(1, 10, buffered=False)
+        assert database._msg_buf == []
+        assert database.db.messages.docs == [{"telegram_user_id": 1, "message_id": 10}]
+
+    async def test_duplicates_are_ignored(self, database, caplog):
+        """Test duplicate-key errors from re-tracked IDs are not logged."""
+        await database.add_message(1, 10)
+        await database._flush_messages()
+        await database.add_message(1, 10)
+        await database.add_message(1, 11)
+        await database._flush_messages()
+        assert await database.get_messages(1) == [10, 11]
+        assert "Error storing" not in caplog.text
+
+
+class FakeUsers:
+    """Records update_one calls against the users collection."""
+
+    def __init__(self):
+        self.updates = []
+
+    async def update_one(self, query, update, upsert=False):
+        self.updates.append((query, update, upsert))
+
+
+class TestUpsertUser:
+    """Test the per-update user write."""
+
+    async def test_activity_and_username_share_one_write(self, database):
+        """Test last activity and username go out in a single upsert."""
+        database.db.users = FakeUsers()
+        assert await database.upsert_user(1, username="milo")
+
+        [(query, update, upsert)] = database.db.users.updates
+        assert query == {"telegram_user_id": 1}
+        assert upsert
+        assert set(update["$set"]) == {"last_active_at", "profile.username"}
+
+    async def test_without_username_only_touches_activity(self, database):
+        """Test no username leaves the stored profile untouched."""
+        database.db.users = FakeUsers()
+        await database.upsert_user(1)
+        assert set(database.db.users.updates[0][1]["$set"]) == {"last_active_at"}
+
+
+class FakeConversations:
+    """Conversations collection whose inserts can be held open."""
+
+    def __init__(self):
+        self.docs = []
+        self.release = asyncio.Event()
+
+    async def insert_one(self, doc):
+        await self.release.wait()
+        self.docs.append(doc)
+
+    async def delete_many(self, query):
+        self.docs = [d for d in self.docs if d["telegram_user_id"] != query["telegram_user_id"]]
+
+
+class TestConversationLog:
+    """Test conversation logging off the webhook path."""
+
+    async def test_log_does_not_wait_for_insert(self, database):
+        """Test the caller returns while the insert is still pending."""
+        database.db.conversations = FakeConversations()
+        database.log_conversation_nowait(1, "user", "hi", "req")
+        await asyncio.sleep(0)
+        assert database.db.conversations.docs == []
+
+        database.db.conversations.release.set()
+        await database._wait_pending_writes()
+        assert database.db.conversations.docs[0]["content"] == "hi"
+
+    async def test_clear_waits_for_pending_logs(self, database):
+        """Test a pending log write cannot land after the clear."""
+        database.db.conversations = FakeConversations()
+        database.log_conversation_nowait(1, "user", "/clear", "req")
+        asyncio.get_running_loop().call_later(0.01, database.db.conversations.release.set)
+
+        assert await database.clear_conversations(1)
+        assert database.db.conversations.docs == []
+
+
+class TestApiRequestsCollection:
+    """Test api_requests collection setup."""
+
+    async def test_created_as_time_series(self, database):
+        """Test a fresh deployment gets a time-series collection with retention."""
+        created = {}
+
+        async def create_collection(name, **options):
+            created[name] = options
+
+        database.db.create_collection = create_collection
+        await database._ensure_api_requests_collection()
+        options = created["api_requests"]
+        assert options["timeseries"]["timeField"] == "timestamp"
+        assert options["timeseries"]["metaField"] == "service_name"
+        assert options["expireAfterSeconds"] > 0
+
+    async def test_existing_collection_is_left_alone(self, database, caplog):
+        """Test a collection created by another worker is not an error."""
+        async def create_collection(name, **options):
+            raise OperationFailure("already exists", code=48)
+
+        database.db.create_collection = create_collection
+        await database._ensure_api_requests_collection()
+        assert "Could not create" not in caplog.text
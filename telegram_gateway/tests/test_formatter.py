@@ -1,6 +1,6 @@
 """Unit tests for response formatter."""
 import pytest
-from app.formatter import TelegramResponseFormatter
+from app.formatter import CALLBACK_DATA_MAX_BYTES, TelegramResponseFormatter, clip_callback_data
 
 
 @pytest.fixture
@@ -146,6 +146,23 @@ class TestResponseFormatting:
         assert any("Confirm" in btn["text"] for row in buttons for btn in row)
         assert any("Cancel" in btn["text"] for row in buttons for btn in row)
     
+    def test_format_match_card_text(self, formatter):
+        """Test each match card lays out name, rating and reason."""
+        response = {
+            "type": "match_list",
+            "content": "Here are your matches:",
+            "items": [
+                {"name": "Alice", "age": 28, "gender": "Female", "reason": "Loves chess",
+                 "rating": 4.8, "match_percentage": 92, "user_id": "u1"},
+                {"name": "Bob", "reason": "Hikes", "user_id": "u2"},
+            ]
+        }
+        
+        result = formatter.format_response(response, chat_id=12345)
+        
+        assert result[1]["text"] == "👤 **Alice (28)** | Female\n⭐ 4.8/5.0 • 92% Match\n\nLoves chess"
+        assert result[2]["text"] == "👤 **Bob**\n⭐ 4.5/5.0\n\nHikes"
+    
     def test_format_unknown_response_type(self, formatter):
         """Test formatting unknown response type falls back to text."""
         response = {
@@ -228,3 +245,30 @@ class TestEdgeCases:
         assert "User4" in result["text"]
         # User5 and beyond should not be included
         assert "User9" not in result["text"]
+
+
+class TestCallbackData:
+    """Test callback_data stays within Telegram's byte limit."""
+
+    def test_short_data_unchanged(self):
+        """Test data under the limit is returned as-is."""
+        assert clip_callback_data("SKIP:42") == "SKIP:42"
+
+    @pytest.mark.parametrize("name", ["A" * 80, "Зоя" * 30, "🙂" * 30])
+    def test_long_data_fits_in_bytes(self, name):
+        """Test long or multi-byte names are cut on a character boundary."""
+        data = clip_callback_data(f"REQUEST:123|{name}")
+        assert len(data.encode("utf-8")) <= CALLBACK_DATA_MAX_BYTES
+        assert data.startswith("REQUEST:123|")
+        assert f"REQUEST:123|{name}".startswith(data)
+
+    def test_match_card_buttons_fit(self, formatter):
+        """Test match card buttons never exceed the limit for non-ASCII names."""
+        response = {
+            "type": "match_list",
+            "content": "Matches",
+            "items": [{"name": "Александра" * 4, "user_id": "u1", "reason": "r"}]
+        }
+        card = formatter.format_response(response, chat_id=1)[1]
+        for button in card["reply_markup"]["inline_keyboard"][0]:
+            assert len(button["callback_data"].encode("utf-8")) <= CALLBACK_DATA_MAX_BYTES
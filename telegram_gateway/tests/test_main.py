@@ -0,0 +1,80 @@
+"""Unit tests for the application lifespan."""
+import httpx
+import pytest
+from app import main
+from app.api_client import InternalAPIClient
+
+
+class FakeDatabase:
+    """Records telemetry writes and whether they arrived after close."""
+
+    def __init__(self, **kwargs):
+        self.closed = False
+        self.stored = []
+        self.late_writes = 0
+
+    async def store_api_requests(self, records):
+        if self.closed:
+            self.late_writes += 1
+        self.stored.extend(records)
+        return True
+
+    async def disconnect(self):
+        self.closed = True
+
+
+class FakeSessionManager:
+    def __init__(self, settings, database):
+        self.database = database
+
+    async def connect(self):
+        pass
+
+    async def disconnect(self):
+        await self.database.disconnect()
+
+
+class FakeRateLimiter:
+    def __init__(self, settings):
+        pass
+
+    async def connect(self):
+        pass
+
+    async def disconnect(self):
+        pass
+
+
+@pytest.fixture
+def offline_app(monkeypatch):
+    """Run the real lifespan against in-memory stand-ins for every backend."""
+    async def no_connect(self):
+        pass
+
+    async def no_cron(*args):
+        pass
+
+    monkeypatch.setattr(main, "Database", FakeDatabase)
+    monkeypatch.setattr(main, "SessionManager", FakeSessionManager)
+    monkeypatch.setattr(main, "RateLimiter", FakeRateLimiter)
+    monkeypatch.setattr(main, "start_cron_scheduler", no_cron)
+    monkeypatch.setattr(InternalAPIClient, "connect", no_connect)
+    monkeypatch.setattr(
+        main.httpx, "AsyncHTTPTransport",
+        lambda **kwargs: httpx.MockTransport(lambda request: httpx.Response(200, json={"ok": True}))
+    )
+    return main.app
+
+
+class TestLifespan:
+    """Test startup and shutdown ordering."""
+
+    async def test_queued_telemetry_is_written_before_database_closes(self, offline_app):
+        """Test shutdown drains API request records while the database is still open."""
+        async with main.lifespan(offline_app):
+            database = main.database
+            main.api_client._record_request(service_name="Test", endpoint="/x", status_code=200)
+
+        assert [r["service_name"] for r in database.stored] == ["Test"]
+        assert database.late_writes == 0
+        assert database.closed
@@ -1,6 +1,6 @@
 """Unit tests for webhook parsing and routing."""
 import pytest
-from app.router import TelegramRouter
+from app.router import TelegramRouter, _strip_command
 from app.api_client import InternalAPIClient
 from app.config import Settings
 
@@ -205,3 +205,133 @@ class TestRouterMapping:
         
         assert len(command_keys) == len(set(command_keys))
         assert len(callback_keys) == len(set(callback_keys))
+
+    def test_text_routes_defined(self, router):
+        """Test reply-keyboard labels map to handlers and command text."""
+        for label in ["Set Profile", "My Profile", "Set Goal", "Find Matches", "My Connections"]:
+            handler, command_text = router.TEXT_ROUTES[label]
+            assert callable(handler)
+            assert command_text.startswith("/")
+
+    @pytest.mark.asyncio
+    async def test_text_route_dispatch(self, router):
+        """Test a keyboard label is dispatched with its command text."""
+        calls = []
+
+        async def mock_handler(chat_id, telegram_user_id, text, request_id):
+            calls.append(text)
+            return {"type": "text", "content": "ok"}
+
+        router.TEXT_ROUTES["Find Matches"] = (mock_handler, "/matches")
+        update = {
+            "message": {
+                "from": {"id": 12345},
+                "chat": {"id": 67890},
+                "text": "Find Matches"
+            }
+        }
+
+        response = await router.route_update(update, "67890", 12345, "test_request_id")
+
+        assert response == {"type": "text", "content": "ok"}
+        assert calls == ["/matches"]
+
+
+
+class TestExtractUserInfo:
+    """Test the full tuple extracted from updates."""
+
+    def test_message_update(self):
+        """Test every field is read from a message update."""
+        from app.main import extract_user_info
+
+        update = {"message": {
+            "message_id": 7, "text": "Hi",
+            "from": {"id": 12345, "username": "milo"}, "chat": {"id": 67890}
+        }}
+        assert extract_user_info(update) == (12345, 67890, 7, "milo", "Hi")
+
+    def test_callback_update(self):
+        """Test callback data is returned as the text."""
+        from app.main import extract_user_info
+
+        update = {"callback_query": {
+            "data": "SKIP:1", "from": {"id": 12345},
+            "message": {"message_id": 8, "chat": {"id": 67890}}
+        }}
+        assert extract_user_info(update) == (12345, 67890, 8, None, "SKIP:1")
+
+    @pytest.mark.parametrize("update", [
+        {},
+        {"edited_message": {"from": {"id": 1}}},
+        {"message": {"from": None, "chat": None}},
+        {"callback_query": {"from": {"id": 1}, "message": None}},
+        {"message": "not an object"},
+    ])
+    def test_missing_or_malformed_fields(self, update):
+        """Test absent or null fields yield None instead of raising."""
+        from app.main import extract_user_info
+
+        user_id, chat_id, _, _, _ = extract_user_info(update)
+        assert chat_id is None
+
+
+class TestRequestId:
+    """Test request ID generation."""
+
+    def test_request_ids_are_uuid7(self):
+        """Test IDs are valid, unique UUIDv7 strings in time order."""
+        import uuid
+        from app.main import request_id_v7
+
+        ids = [request_id_v7() for _ in range(100)]
+        assert len(set(ids)) == 100
+        assert all(uuid.UUID(i).version == 7 for i in ids)
+        assert [i[:13] for i in ids] == sorted(i[:13] for i in ids)
+
+
+class TestConnectionsCommand:
+    """Test the /connections listing."""
+
+    @pytest.mark.asyncio
+    async def test_lists_every_section(self, router):
+        """Test connections, incoming and outgoing requests are all rendered."""
+        class FakeDatabase:
+            async def get_onboarding_status(self, uid): return True
+            async def get_incoming_requests(self, uid):
+                return [{"from_name": "Cara", "from_user_id": 3}]
+            async def get_outgoing_requests(self, uid):
+                return [{"to_name": "Dan", "to_user_id": 4, "status": "pending"}]
+            async def get_all_connections(self, uid):
+                return [{"other_name": "Alice", "other_id": 1}, {"other_name": "Bob", "other_id": 2}]
+
+        router.api_client.database = FakeDatabase()
+        response = await router._handle_connections_command("c", 12345, "/connections", "req")
+
+        assert response["content"] == (
+            "🔗 **Your Connections & Requests**\n\n"
+            "🤝 **Established Connections:**\n"
+            "• **Alice**\n"
+            "• **Bob**\n"
+            "\n"
+            "📩 **Incoming Requests:**\n"
+            "• **Cara** wants to connect\n"
+            "📤 **Outgoing Requests:**\n"
+            "• Sent to **Dan** (pending)\n"
+        )
+        assert len(response["buttons"]) == 4
+
+
+class TestStripCommand:
+    """Test command prefix stripping."""
+
+    @pytest.mark.parametrize("text,expected", [
+        ("/connect baking buddy", "baking buddy"),
+        ("/connect@MiloBot baking buddy", "baking buddy"),
+        ("/generate a story about /generate", "a story about /generate"),
+        ("/new", ""),
+        ("/connect   gym buddy  ", "gym buddy"),
+    ])
+    def test_strip_command(self, text, expected):
+        """Test only the leading command token is removed."""
+        assert _strip_command(text) == expected